@@ -1,25 +1,38 @@
 import os
+import asyncio
+import atexit
+import bisect
 import json
 import csv
+import functools
+import gzip
+import heapq
+import io
+import itertools
+import pickle
 import re
 import queue
 import threading
-from datetime import datetime, timedelta
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
 
 from fastapi import FastAPI, Request, Response, HTTPException
 from fastapi import BackgroundTasks
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import StreamingResponse, JSONResponse
 from pydantic import BaseModel
-from pymongo import MongoClient, ReturnDocument
+from pymongo import IndexModel, MongoClient, ReturnDocument, UpdateOne
 from dotenv import load_dotenv
 import certifi
 
 # Local scoring utils
 try:
-    from .scoring_algorithm import ScoringTrain, get_available_platforms, calculate_platform_scores  # type: ignore
+    from .scoring_algorithm import ScoringTrain, get_available_platforms, calculate_platform_scores, flatten_blockage_matrix  # type: ignore
 except Exception:
-    from scoring_algorithm import ScoringTrain, get_available_platforms, calculate_platform_scores  # type: ignore
+    from scoring_algorithm import ScoringTrain, get_available_platforms, calculate_platform_scores, flatten_blockage_matrix  # type: ignore
 
 # Ensure we load the .env that lives in the parent 'api' folder even when
 # this file is executed from elsewhere (e.g., project root with uvicorn)
@@ -44,10 +57,29 @@ logs_collection = db['operations_log']
 reports_collection = db['daily_reports']
 counters_collection = db['daily_counters']
 suggestions_cache_collection = db['suggestions_cache']
+schema_meta_collection = db['schema_meta']
+
+# Indexes the backend relies on, keyed by collection name. Startup only talks to
+# Mongo about these when the recorded signature in `schema_meta` differs.
+# NOTE: Reports allow multiple entries per train per day (reassign creates a new row),
+# so (date, trainNo) must NOT be unique.
+EXPECTED_INDEXES: dict[str, list[IndexModel]] = {
+    'daily_reports': [IndexModel([('date', 1), ('trainNo', 1), ('event_time', 1)])],
+    'daily_counters': [IndexModel('date')],
+    'suggestions_cache': [IndexModel([('date', 1), ('trainNo', 1)])],
+    'operations_log': [IndexModel('timestamp')],
+    'trains': [IndexModel('TRAIN NO', unique=True)],
+}
 
 API_DIR = os.path.dirname(__file__)
 BLOCKAGE_MATRIX_FILE = os.path.join(API_DIR, 'Track Connections.xlsx - Tracks.csv')
+BLOCKAGE_MATRIX_CACHE_FILE = BLOCKAGE_MATRIX_FILE + '.cache.pkl'
+# Bump whenever parse_blockage_cell / _parse_blockage_matrix_csv output changes so
+# pickles written by an older parser are rebuilt instead of loaded.
+BLOCKAGE_MATRIX_CACHE_VERSION = 2
 BLOCKAGE_MATRIX = {}
+# (incoming_line, platform_column) -> routes; derived from BLOCKAGE_MATRIX on every reload.
+BLOCKAGE_FLAT: dict[tuple[str, str], list] = {}
 INCOMING_LINES = []
 
 # Incoming lines dropdown topology order (as provided by ops).
@@ -66,6 +98,25 @@ TOPOLOGY_INCOMING_LINES = [
     'HWH UP',
 ]
 
+_WS_RE = re.compile(r"\s+")
+
+
+# Whole-word token swaps tried when resolving UI line labels to matrix keys.
+_LINE_WORD_SWAPS = tuple(
+    (re.compile(rf"\b{src}\b", re.IGNORECASE), dst)
+    for src, dst in (('MID', 'MD'), ('MD', 'MID'), ('DOWN', 'DN'), ('DN', 'DOWN'))
+)
+
+
+@functools.lru_cache(maxsize=512)
+def _norm(s: str) -> str:
+    """Case- and whitespace-insensitive form of an incoming-line label."""
+    return _WS_RE.sub(" ", str(s or '').strip()).lower()
+
+
+# _norm(topology label) -> position in TOPOLOGY_INCOMING_LINES.
+_TOPOLOGY_INDEX: dict[str, int] = {_norm(topo): i for i, topo in enumerate(TOPOLOGY_INCOMING_LINES)}
+
 
 def order_lines_by_topology(lines: list[str]) -> list[str]:
     """Return `lines` ordered by TOPOLOGY_INCOMING_LINES, appending unknowns.
@@ -76,34 +127,37 @@ def order_lines_by_topology(lines: list[str]) -> list[str]:
     if not lines:
         return []
 
-    def _norm(s: str) -> str:
-        return re.sub(r"\s+", " ", str(s or '').strip()).lower()
-
-    available_norm = {}
-    for raw in lines:
+    unknown_rank = len(TOPOLOGY_INCOMING_LINES)
+    seen = set()
+    keyed = []
+    for pos, raw in enumerate(lines):
         n = _norm(raw)
-        if not n:
-            continue
         # keep first occurrence (preserve original list stability)
-        available_norm.setdefault(n, str(raw).strip())
-
-    ordered: list[str] = []
-    used = set()
-    for topo in TOPOLOGY_INCOMING_LINES:
-        n = _norm(topo)
-        if n in available_norm and n not in used:
-            ordered.append(topo)
-            used.add(n)
-
-    # Append anything not in topology list (in the order it appeared).
-    for raw in lines:
-        n = _norm(raw)
-        if not n or n in used:
+        if not n or n in seen:
             continue
-        ordered.append(str(raw).strip())
-        used.add(n)
-
-    return ordered
+        seen.add(n)
+        idx = _TOPOLOGY_INDEX.get(n)
+        if idx is None:
+            # Anything not in the topology list goes last, in the order it appeared.
+            keyed.append((unknown_rank, pos, str(raw).strip()))
+        else:
+            keyed.append((idx, pos, TOPOLOGY_INCOMING_LINES[idx]))
+    keyed.sort()
+    return [label for _, _, label in keyed]
+
+
+# Normalized UI line label -> matrix key for labels that differ by more than spelling.
+_INCOMING_LINE_ALIASES = {
+    'mdn dn joint': 'MDN MD 1',
+    'mdn up joint': 'MDN MD 2',
+    'east coast down joint': 'HIJ MD 1 (DN)',
+    'east coast up joint': 'HIJ MD 2 (UP)',
+    'adra joint': 'TATA MD',
+}
+# _norm(matrix key) -> matrix key; derived from BLOCKAGE_MATRIX on every reload.
+_NORM_TO_KEY: dict[str, str] = {}
+# Matrix keys as a set for membership filters; derived from BLOCKAGE_MATRIX on every reload.
+_BLOCKAGE_KEY_SET: frozenset[str] = frozenset()
 
 
 def resolve_incoming_line_for_blockage_matrix(incoming_line: str | None) -> str:
@@ -122,30 +176,10 @@ def resolve_incoming_line_for_blockage_matrix(incoming_line: str | None) -> str:
     if raw in BLOCKAGE_MATRIX:
         return raw
 
-    def _norm(s: str) -> str:
-        return re.sub(r"\s+", " ", str(s or '').strip()).lower()
-
-    # Build a normalized lookup table of matrix keys.
-    norm_to_key: dict[str, str] = {}
-    try:
-        for k in (BLOCKAGE_MATRIX or {}).keys():
-            ks = str(k or '').strip()
-            if not ks:
-                continue
-            norm_to_key.setdefault(_norm(ks), ks)
-    except Exception:
-        norm_to_key = {}
-
+    norm_to_key = _NORM_TO_KEY
     n = _norm(raw)
 
-    _alias_map = {
-        'mdn dn joint': 'MDN MD 1',
-        'mdn up joint': 'MDN MD 2',
-        'east coast down joint': 'HIJ MD 1 (DN)',
-        'east coast up joint': 'HIJ MD 2 (UP)',
-        'adra joint': 'TATA MD',
-    }
-    aliased = _alias_map.get(n)
+    aliased = _INCOMING_LINE_ALIASES.get(n)
     if aliased:
         if aliased in BLOCKAGE_MATRIX:
             return aliased
@@ -156,19 +190,11 @@ def resolve_incoming_line_for_blockage_matrix(incoming_line: str | None) -> str:
     if n in norm_to_key:
         return norm_to_key[n]
 
-    def _swap_word(s: str, src: str, dst: str) -> str:
-        return re.sub(rf"\b{re.escape(src)}\b", dst, s, flags=re.IGNORECASE)
-
     # Try a small set of safe token aliases used in ops naming.
-    candidates = {
-        raw,
-        _swap_word(raw, 'MID', 'MD'),
-        _swap_word(raw, 'MD', 'MID'),
-        _swap_word(raw, 'DOWN', 'DN'),
-        _swap_word(raw, 'DN', 'DOWN'),
-    }
+    candidates = {raw}
+    candidates.update(pattern.sub(dst, raw) for pattern, dst in _LINE_WORD_SWAPS)
     for cand in list(candidates):
-        candidates.add(re.sub(r"\s+", " ", str(cand).strip()))
+        candidates.add(_WS_RE.sub(" ", str(cand).strip()))
 
     for cand in candidates:
         if cand in BLOCKAGE_MATRIX:
@@ -180,26 +206,63 @@ def resolve_incoming_line_for_blockage_matrix(incoming_line: str | None) -> str:
     return raw
 
 
+def _rebuild_blockage_indexes():
+    """Recompute lookup structures derived from BLOCKAGE_MATRIX; call after every reload."""
+    global BLOCKAGE_FLAT, _NORM_TO_KEY, _BLOCKAGE_KEY_SET
+    BLOCKAGE_FLAT = flatten_blockage_matrix(BLOCKAGE_MATRIX)
+    _BLOCKAGE_KEY_SET = frozenset(BLOCKAGE_MATRIX or ())
+    norm_to_key: dict[str, str] = {}
+    for k in BLOCKAGE_MATRIX or {}:
+        ks = str(k or '').strip()
+        if ks:
+            norm_to_key.setdefault(_norm(ks), ks)
+    _NORM_TO_KEY = norm_to_key
+    # Scores were computed against the previous matrix.
+    _score_cache.clear()
+
+
+# Ranked scorer output keyed by every input calculate_platform_scores reads. Frontend
+# polling re-asks the same question often; the cache is dropped on matrix reloads and
+# simply cleared once it grows past SCORE_CACHE_MAX entries.
+SCORE_CACHE_MAX = 1024
+_score_cache: dict[tuple, list[dict]] = {}
+
+
+def cached_platform_scores(incoming_train: ScoringTrain, available_platforms: set, incoming_line: str) -> list[dict]:
+    key = (
+        incoming_train.historical_platform,
+        bool(incoming_train.is_terminating),
+        incoming_train.direction,
+        frozenset(available_platforms),
+        incoming_line,
+    )
+    ranked = _score_cache.get(key)
+    if ranked is None:
+        ranked = calculate_platform_scores(incoming_train, available_platforms, incoming_line, BLOCKAGE_MATRIX, BLOCKAGE_FLAT)
+        if len(_score_cache) >= SCORE_CACHE_MAX:
+            _score_cache.clear()
+        _score_cache[key] = ranked
+    return ranked
+
+
 def _dedupe_preserve_order(values: list[str]) -> list[str]:
-    seen = set()
-    out = []
-    for v in values:
-        s = str(v).strip()
-        if not s or s in seen:
-            continue
-        seen.add(s)
-        out.append(s)
-    return out
+    stripped = (str(v).strip() for v in values)
+    return list(dict.fromkeys(s for s in stripped if s))
 
 
 def _prefer_lines_matching_matrix(values: list[str]) -> list[str]:
     """If blockage matrix is loaded, prefer lines that exist in it."""
-    cleaned = _dedupe_preserve_order([str(v).strip() for v in (values or [])])
-    if not cleaned or not BLOCKAGE_MATRIX:
+    cleaned = _dedupe_preserve_order(values or [])
+    allowed = _BLOCKAGE_KEY_SET
+    if not cleaned or not allowed:
         return cleaned
-    allowed = set(BLOCKAGE_MATRIX.keys())
-    filtered = [v for v in cleaned if v in allowed]
-    return filtered if filtered else cleaned
+    return [v for v in cleaned if v in allowed] or cleaned
+
+
+# [valid_until_monotonic, name] for the track-connections collection lookup. Both Mongo
+# loaders resolve it during startup; this keeps that to one list_collection_names call.
+TRACK_CONNECTIONS_NAME_TTL = 60.0
+_track_connections_name_cache: list = [float('-inf'), None]
 
 
 def _find_track_connections_collection_name() -> str | None:
@@ -208,6 +271,14 @@ def _find_track_connections_collection_name() -> str | None:
     In your DB this is typically named similar to:
     'Track Connections.xlsx - Tracks.csv' or 'Track Connections.xlsx - Tracks'.
     """
+    now = time.monotonic()
+    if now >= _track_connections_name_cache[0]:
+        _track_connections_name_cache[1] = _scan_track_connections_collection_name()
+        _track_connections_name_cache[0] = now + TRACK_CONNECTIONS_NAME_TTL
+    return _track_connections_name_cache[1]
+
+
+def _scan_track_connections_collection_name() -> str | None:
     try:
         names = db.list_collection_names()
     except Exception:
@@ -318,7 +389,7 @@ TRACK_LABELS = {
     'Track 5': 'Midnapore 10',
     'Track 6': 'Midnapore 11',
 }
-ALLOWED_TRACK_IDS = set(TRACK_LABELS.keys())
+ALLOWED_TRACK_IDS = frozenset(TRACK_LABELS)
 
 # Business rule helpers (keep scoring_algorithm unchanged)
 SHORT_SINGLE_PLATFORM_IDS = {
@@ -334,23 +405,80 @@ DOWN_STATIONS = {'SRC', 'SHM', 'HWH', 'PKU', 'SDAH'}
 A_PLATFORM_IDS = {'P1A', 'P2A', 'P3A', 'P4A'}
 
 # --- Train metadata cache (cuts round trips to Mongo for every suggestion/assignment) ---
+# Readers do plain dict lookups without the lock (single get/set/pop are atomic under the
+# GIL); writers serialize on train_cache_lock and full refreshes rebind a new dict.
 TRAIN_CACHE: dict[str, dict] = {}
 train_cache_lock = threading.Lock()
+# Master docs fetched per cursor round trip while warming the cache.
+TRAIN_CACHE_BATCH_SIZE = 500
+# trainNo -> monotonic time of a lookup that found no master record (freight, ad-hoc
+# trains). Repeats skip Mongo until MASTER_CACHE_TTL lapses or the train is added.
+_train_cache_misses: dict[str, float] = {}
+# Only the master fields the suggestion/assignment paths read are loaded into the cache.
+TRAIN_RECORD_PROJECTION = {
+    '_id': 0,
+    **dict.fromkeys((
+        'TRAIN NO', 'trainNo', 'TRAIN NAME', 'ARRIVAL AT KGP', 'DEPARTURE FROM KGP', 'LENGTH', 'DIRECTION',
+        'ISTERMINATING', 'PLATFORM NO', 'ZONE', 'ORIGIN FROM STATION', 'DESTINATION', 'TERMINAL',
+    ), 1),
+}
+
+
+def _annotate_train_doc(doc: dict) -> dict:
+    """Precompute derived flags once when a train doc enters the cache."""
+    name = str(doc.get('TRAIN NAME') or '')
+    doc['_isFreight'] = 'Goods' in name or 'Freight' in name
+    return doc
 
 
 def refresh_train_cache():
     """Warm the in-memory cache with all train docs. Called at startup and after bulk updates."""
+    global TRAIN_CACHE, _train_cache_misses
+    _invalidate_master_cache()
+    fresh: dict[str, dict] = {}
     try:
-        docs = list(trains_collection.find({}, {'_id': 0}))
+        for doc in trains_collection.find({}, TRAIN_RECORD_PROJECTION).batch_size(TRAIN_CACHE_BATCH_SIZE):
+            train_no = str(doc.get('TRAIN NO') or doc.get('trainNo') or '')
+            if train_no:
+                fresh[train_no] = _annotate_train_doc(doc)
     except Exception as exc:
         log_action(f"TRAIN_CACHE: initial load failed {exc}")
-        docs = []
+        fresh = {}
     with train_cache_lock:
-        TRAIN_CACHE.clear()
-        for doc in docs:
-            train_no = str(doc.get('TRAIN NO') or doc.get('trainNo') or '')
-            if train_no:
-                TRAIN_CACHE[train_no] = doc
+        TRAIN_CACHE = fresh
+        _train_cache_misses = {}
+
+
+# (trainNo, (name, scheduled_arrival, scheduled_departure)) rows from the master schedule,
+# reused by /api/station-data for MASTER_CACHE_TTL seconds. Edits made through the API
+# invalidate it immediately; direct DB edits show up once the TTL lapses.
+MASTER_CACHE_TTL = 30.0
+_master_cache: dict = {'at': float('-inf'), 'rows': []}
+
+
+# Master rows list and state doc that /api/station-data last reconciled; while both are
+# the same objects there is nothing new to merge into arrivingTrains.
+_master_synced: dict = {'rows': None, 'state': None}
+
+
+def _invalidate_master_cache():
+    _master_cache['at'] = float('-inf')
+
+
+def _master_schedule_rows() -> list[tuple[str, tuple]]:
+    now = time.monotonic()
+    if now - _master_cache['at'] >= MASTER_CACHE_TTL:
+        cursor = trains_collection.find(
+            {},
+            {'_id': 0, 'TRAIN NO': 1, 'TRAIN NAME': 1, 'ARRIVAL AT KGP': 1, 'DEPARTURE FROM KGP': 1},
+        )
+        _master_cache['rows'] = [
+            (str(row.get('TRAIN NO')), (row.get('TRAIN NAME'), row.get('ARRIVAL AT KGP'), row.get('DEPARTURE FROM KGP')))
+            for row in cursor
+            if str(row.get('TRAIN NO'))
+        ]
+        _master_cache['at'] = now
+    return _master_cache['rows']
 
 
 def cache_train_doc(train_doc: dict):
@@ -359,8 +487,10 @@ def cache_train_doc(train_doc: dict):
     train_no = str(train_doc.get('TRAIN NO') or train_doc.get('trainNo') or '')
     if not train_no:
         return
+    _annotate_train_doc(train_doc)
     with train_cache_lock:
         TRAIN_CACHE[train_no] = train_doc
+        _train_cache_misses.pop(train_no, None)
 
 
 def remove_from_train_cache(train_no: str | None):
@@ -373,25 +503,159 @@ def remove_from_train_cache(train_no: str | None):
 def get_train_record(train_no: str | None, force_db: bool = False) -> dict:
     if not train_no:
         return {}
-    train_no = str(train_no)
+    if type(train_no) is not str:
+        train_no = str(train_no)
     if not force_db:
-        with train_cache_lock:
-            cached = TRAIN_CACHE.get(train_no)
+        cached = TRAIN_CACHE.get(train_no)
+        missed_at = _train_cache_misses.get(train_no)
         if cached:
             return cached
-    doc = trains_collection.find_one({"TRAIN NO": train_no}) or {}
+        if missed_at is not None and time.monotonic() - missed_at < MASTER_CACHE_TTL:
+            return {}
+    doc = trains_collection.find_one({"TRAIN NO": train_no}, TRAIN_RECORD_PROJECTION) or {}
     if doc:
         cache_train_doc(doc)
+    else:
+        with train_cache_lock:
+            _train_cache_misses[train_no] = time.monotonic()
     return doc
 
 # --- SSE infra ---
-sse_broadcaster: queue.Queue[str] = queue.Queue()
-active_timers: dict[str, threading.Timer] = {}
-timers_lock = threading.Lock()
+# Upper bound on queued frames merged into one write for a /api/stream client.
+SSE_MAX_COALESCE = 32
+# Frames buffered per /api/stream client; a client that falls further behind loses
+# its oldest frames rather than growing server memory.
+SSE_QUEUE_MAX = 256
+_SSE_CONNECTED = b": connected\n\n"
+_SSE_PING = b"event: ping\ndata: {}\n\n"
+
+
+def _sse_frame(event: str, payload) -> bytes:
+    """Encode one SSE frame; frames travel as UTF-8 bytes so Starlette sends them as-is."""
+    return f"event: {event}\ndata: {json.dumps(payload, separators=(',', ':'))}\n\n".encode('utf-8')
+
+
+class SSEBroadcaster:
+    """Fan SSE frames out to every connected /api/stream client.
+
+    `put` may be called from any thread (timers, background tasks); each client
+    owns a bounded asyncio.Queue that is fed on that client's event loop.
+    """
+
+    def __init__(self):
+        # Copy-on-write: subscribe/unsubscribe swap in a new tuple under the lock,
+        # so put() reads a consistent snapshot without taking it.
+        self._lock = threading.Lock()
+        self._subscribers: tuple[tuple[asyncio.Queue, asyncio.AbstractEventLoop], ...] = ()
+
+    def subscribe(self) -> asyncio.Queue:
+        q: asyncio.Queue = asyncio.Queue(maxsize=SSE_QUEUE_MAX)
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            self._subscribers = self._subscribers + ((q, loop),)
+        return q
+
+    def unsubscribe(self, q: asyncio.Queue):
+        with self._lock:
+            self._subscribers = tuple(sub for sub in self._subscribers if sub[0] is not q)
+
+    @staticmethod
+    def _offer(q: asyncio.Queue, msg: bytes):
+        # Runs on the client's loop: drop the oldest frame when the client is behind.
+        if q.full():
+            q.get_nowait()
+        q.put_nowait(msg)
+
+    def put(self, msg: bytes):
+        for q, loop in self._subscribers:
+            try:
+                loop.call_soon_threadsafe(self._offer, q, msg)
+            except RuntimeError:
+                # Event loop already closed; the client is gone.
+                self.unsubscribe(q)
+
+
+sse_broadcaster = SSEBroadcaster()
+
+# Departure alerts live in one min-heap of (due, seq, platform_id, frame) drained by
+# a single daemon thread, rather than one threading.Timer thread per occupied platform.
+# active_timers maps a platform to the seq of its pending alert; cancelling just drops
+# that mapping and the stale heap entry is skipped when it comes due.
+_sched_heap: list[tuple[float, int, str, bytes]] = []
+_sched_cv = threading.Condition()
+_sched_seq = itertools.count()
+_sched_thread: threading.Thread | None = None
+active_timers: dict[str, int] = {}
+
+
+def _departure_alert_loop():
+    while True:
+        with _sched_cv:
+            while True:
+                if not _sched_heap:
+                    _sched_cv.wait()
+                    continue
+                due, seq, platform_id, frame = _sched_heap[0]
+                delay = due - time.monotonic()
+                if delay > 0:
+                    _sched_cv.wait(delay)
+                    continue
+                heapq.heappop(_sched_heap)
+                if active_timers.get(platform_id) == seq:
+                    del active_timers[platform_id]
+                    break
+        sse_broadcaster.put(frame)
+
+
+def schedule_departure_alert(platform_id: str, delay_seconds: float, frame: bytes):
+    """Broadcast `frame` after `delay_seconds` unless the platform is cleared first."""
+    global _sched_thread
+    with _sched_cv:
+        seq = next(_sched_seq)
+        active_timers[platform_id] = seq
+        heapq.heappush(_sched_heap, (time.monotonic() + delay_seconds, seq, platform_id, frame))
+        if _sched_thread is None or not _sched_thread.is_alive():
+            _sched_thread = threading.Thread(target=_departure_alert_loop, name='departure-alerts', daemon=True)
+            _sched_thread.start()
+        _sched_cv.notify()
+
+
+def cancel_departure_alert(platform_id: str | None):
+    with _sched_cv:
+        active_timers.pop(platform_id, None)
+
+# Target size of each chunk yielded by the CSV download stream.
+CSV_STREAM_CHUNK_SIZE = 64 * 1024
+
+# Column order shared by the downloadable report and the per-day CSV files.
+REPORT_CSV_HEADERS = (
+    'date', 'trainNo', 'trainName', 'scheduled_arrival', 'scheduled_departure',
+    'actual_arrival', 'actual_departure', 'actual_platform_arrival', 'suggestions', 'actual_platform',
+    'incoming_line', 'outgoing_line', 'Remarks',
+)
+_CSV_HEADER_BYTES = (','.join(REPORT_CSV_HEADERS) + '\n').encode('utf-8')
+# Rows fetched per cursor round trip while streaming reports.
+CSV_CURSOR_BATCH_SIZE = 1000
+# Reports smaller than this are returned as a plain Response instead of a stream.
+CSV_INLINE_MAX_ROWS = 500
+# zlib level for report downloads sent with Content-Encoding: gzip.
+CSV_GZIP_LEVEL = 6
+# Fields read when formatting report rows (legacy rows only carry top3_suggestions).
+REPORT_CSV_PROJECTION = {'_id': 0, 'top3_suggestions': 1, **dict.fromkeys(REPORT_CSV_HEADERS, 1)}
+# Rows handed to each writerows() call when rewriting api/reports/<date>.csv.
+DAILY_CSV_WRITE_CHUNK = 500
+_CSV_CONTENT_TYPE = 'text/csv; charset=utf-8'
+_CSV_DISPOSITION_TMPL = 'attachment; filename="%s"'
+_YMD_RE = re.compile(r'\d{4}-\d{2}-\d{2}')
 
 # Coalesced CSV write scheduling (avoid churn while keeping eventual consistency)
-csv_timers: dict[str, threading.Timer] = {}
-csv_timers_lock = threading.Lock()
+# schedule_csv_write pushes a date's due time CSV_WRITE_DEBOUNCE seconds out; one
+# daemon thread rewrites each date's file once it comes due, so bursts of report
+# writes never start more than a single writer thread.
+CSV_WRITE_DEBOUNCE = 1.0
+_csv_pending: dict[str, float] = {}
+_csv_cv = threading.Condition()
+_csv_thread: threading.Thread | None = None
 
 # --- FastAPI app ---
 app = FastAPI(title="Kharagpur Station Control API", version="2.0")
@@ -408,39 +672,79 @@ app.add_middleware(
 
 # ---------- Helpers ----------
 
+def _next_cursor_batch(cursor, size: int = CSV_CURSOR_BATCH_SIZE) -> list:
+    return list(itertools.islice(cursor, size))
+
+
+_ROUTE_RE = re.compile(r'(\d+)\s*\(\s*(.*?)\s*\)')
+_ROUTE_NUM_SPLIT_RE = re.compile(r'\s*,\s*')
+
+
+# '\r\n' becomes '\n\n'; the resulting empty lines are skipped like any blank line.
+_CR_TO_LF = str.maketrans('\r', '\n')
+
+
 def parse_blockage_cell(cell_string):
-    s = str(cell_string or '')
-    s = s.replace('\r\n', '\n').replace('\r', '\n').strip()
-    up = s.upper().replace(' ', '')
-    if not s or up == '--NA--' or (('NA' in up) and ('(' not in s)):
+    s = str(cell_string or '').translate(_CR_TO_LF).strip()
+    # '--NA--' (and any other NA marker without route groups) means no routes.
+    if not s or ('(' not in s and 'NA' in s.upper().replace(' ', '')):
         return []
     routes = []
     for part in s.split('\n'):
         part = part.strip()
         if not part:
             continue
-        route_data = {'full': [], 'partial': []}
-        matches = re.findall(r'(\d+)\s*\((.*?)\)', part)
-        if len(matches) >= 1:
-            nums_str = matches[0][1].strip()
+        # Only the first two groups matter (full, then partial blockages).
+        groups = [[], []]
+        for slot, match in zip(range(2), _ROUTE_RE.finditer(part)):
+            nums_str = match.group(2)
             if nums_str:
-                route_data['full'] = [f"P{s.strip()}" for s in nums_str.split(',')]
-        if len(matches) >= 2:
-            nums_str = matches[1][1].strip()
-            if nums_str:
-                route_data['partial'] = [f"P{s.strip()}" for s in nums_str.split(',')]
-        routes.append(route_data)
+                groups[slot] = ['P' + n for n in _ROUTE_NUM_SPLIT_RE.split(nums_str)]
+        routes.append({'full': groups[0], 'partial': groups[1]})
     return routes
 
 
 def load_blockage_matrix():
+    """Load the parsed blockage matrix, reusing the on-disk pickle while the CSV is unchanged."""
+    try:
+        st = os.stat(BLOCKAGE_MATRIX_FILE)
+        cache_key = f"v{BLOCKAGE_MATRIX_CACHE_VERSION}-{st.st_mtime_ns}-{st.st_size}"
+    except OSError:
+        cache_key = None
+    if cache_key:
+        try:
+            with open(BLOCKAGE_MATRIX_CACHE_FILE, 'rb') as f:
+                cached_key, matrix, lines = pickle.load(f)
+            if cached_key == cache_key and isinstance(matrix, dict) and isinstance(lines, list):
+                return matrix, lines
+        except Exception:
+            # Unreadable or differently shaped pickle: treat as a miss and rebuild.
+            pass
+
+    matrix, lines = _parse_blockage_matrix_csv()
+
+    if cache_key:
+        # Best effort: read-only deployments simply re-parse on each start.
+        try:
+            tmp_path = BLOCKAGE_MATRIX_CACHE_FILE + '.tmp'
+            with open(tmp_path, 'wb') as f:
+                pickle.dump((cache_key, matrix, lines), f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, BLOCKAGE_MATRIX_CACHE_FILE)
+        except Exception:
+            pass
+    return matrix, lines
+
+
+def _parse_blockage_matrix_csv():
     matrix, lines = {}, []
     with open(BLOCKAGE_MATRIX_FILE, mode='r', encoding='utf-8-sig', newline='') as infile:
         reader = csv.reader(infile)
         headers = next(reader, None)
         if not headers:
             return {}, []
-        headers = [h.strip() for h in headers]
+        # Resolve column labels once; csv.reader already yields str cells.
+        headers = tuple(h.strip() or f"Col{i}" for i, h in enumerate(headers))
+        n_cols = len(headers)
         for row in reader:
             if not row:
                 continue
@@ -448,36 +752,95 @@ def load_blockage_matrix():
             if not incoming_line:
                 continue
             lines.append(incoming_line)
-            matrix[incoming_line] = {}
-            max_cols = min(len(row), len(headers))
-            for col_idx in range(1, max_cols):
-                cell = row[col_idx]
-                if not cell or not str(cell).strip():
+            line_row = matrix[incoming_line] = {}
+            for col_idx, cell in enumerate(row[1:n_cols], start=1):
+                cell = cell.strip()
+                if not cell:
                     continue
-                platform_header = headers[col_idx] if col_idx < len(headers) else f"Col{col_idx}"
-                platform_header = platform_header.strip() or f"Col{col_idx}"
-                matrix[incoming_line][platform_header] = parse_blockage_cell(cell)
+                # Most filled cells are the '--NA--' marker; skip the route parser for them.
+                line_row[headers[col_idx]] = [] if cell == '--NA--' else parse_blockage_cell(cell)
     return matrix, lines
 
 
+_UTC = timezone.utc
+
+
+def _utc_now_iso() -> str:
+    """UTC timestamp for report event_time/updated_at fields, at millisecond precision."""
+    return datetime.now(_UTC).isoformat(timespec='milliseconds')
+
+
+# [valid_until_epoch, 'YYYY-MM-DD']; recomputed only when the local date rolls over.
+_today_cache: list = [0.0, '']
+
+
 def _today_str():
-    return datetime.now().strftime('%Y-%m-%d')
+    now = time.time()
+    if now >= _today_cache[0]:
+        today = datetime.fromtimestamp(now)
+        next_midnight = datetime.combine(today.date() + timedelta(days=1), datetime.min.time())
+        _today_cache[1] = today.strftime('%Y-%m-%d')
+        _today_cache[0] = next_midnight.timestamp()
+    return _today_cache[1]
+
+
+# [valid_until_epoch, 'HH:MM']; recomputed only when the local minute rolls over.
+_hhmm_cache: list = [0.0, '']
+
+
+def _now_hhmm() -> str:
+    now = time.time()
+    if now >= _hhmm_cache[0]:
+        current = datetime.fromtimestamp(now)
+        _hhmm_cache[1] = current.strftime('%H:%M')
+        _hhmm_cache[0] = now - current.second - current.microsecond / 1e6 + 60
+    return _hhmm_cache[1]
+
+
+def _arrival_sort_key(entry: dict) -> str:
+    """Ordering key for `arrivingTrains` (scheduled arrival, else departure, unknowns last)."""
+    return entry.get('scheduled_arrival') or entry.get('scheduled_departure') or '99:99'
+
+
+def _waiting_sort_key(item: dict) -> tuple:
+    """FCFS key for `waitingList`: enqueue time in epoch ms, then train number."""
+    ms = item.get('enqueued_ms')
+    if ms is None:
+        # Entries queued before enqueued_ms existed only carry the ISO string.
+        try:
+            ms = datetime.fromisoformat(item.get('enqueued_at') or '').timestamp() * 1000
+        except (TypeError, ValueError):
+            ms = float('inf')
+    return (ms, str(item.get('trainNo') or ''))
+
+
+def _hhmm_to_minutes(value: str) -> int:
+    """Parse 'HH:MM' (same inputs strptime('%H:%M') accepts) into minutes since midnight."""
+    hours, minutes = value.split(':')
+    if not (0 < len(hours) <= 2 and 0 < len(minutes) <= 2 and hours.isdecimal() and minutes.isdecimal()):
+        raise ValueError(value)
+    h, m = int(hours), int(minutes)
+    if h > 23 or m > 59:
+        raise ValueError(value)
+    return h * 60 + m
 
 
 def time_difference_seconds(time_str1, time_str2):
     try:
-        t1 = datetime.strptime(time_str1, '%H:%M')
-        t2 = datetime.strptime(time_str2, '%H:%M')
-        if t2 < t1:
-            t2 += timedelta(days=1)
-        return (t2 - t1).total_seconds()
-    except (ValueError, TypeError):
+        diff = _hhmm_to_minutes(time_str2) - _hhmm_to_minutes(time_str1)
+        if diff < 0:
+            diff += 24 * 60
+        return float(diff * 60)
+    except (ValueError, TypeError, AttributeError):
         return 0
 
 
 PLATFORM_NUMBER_REGEX = re.compile(r'(\d+[A-Za-z]*)')
+# Scoring ids such as 'P1', 'P2A', 'T3'.
+_SIMPLE_PLATFORM_ID_RE = re.compile(r'([PT])(\d+)([A-Za-z]*)')
 
 
+@functools.lru_cache(maxsize=1024)
 def normalize_platform_label(label: str | None) -> str:
     """Extract the numeric/alpha suffix from labels like 'Platform 1A' or 'Track 5'."""
     if not label:
@@ -494,11 +857,21 @@ def normalize_platform_labels(labels: list[str] | None) -> list[str]:
     return [normalize_platform_label(lbl) for lbl in labels if lbl]
 
 
+_PARTNER_RE = re.compile(r"^(Platform)\s*(\d+)([A-Za-z]*)$")
+_PARTNER_NUMBERS = {1: 3, 2: 4, 3: 1, 4: 2}
+# Canonical 'Platform <n>' label -> partner label; other spellings go through _PARTNER_RE.
+_PARTNER_MAP = {f"Platform {n}": f"Platform {p}" for n, p in _PARTNER_NUMBERS.items()}
+
+
 def find_partner_platform_id(platform_name: str | None) -> str | None:
     """Resolve the paired platform for long-train assignments (e.g., Platform 1 ↔ Platform 3)."""
     if not platform_name:
         return None
-    m = re.match(r"^(Platform)\s*(\d+)([A-Za-z]*)$", platform_name.strip())
+    name = platform_name.strip()
+    partner = _PARTNER_MAP.get(name)
+    if partner is not None:
+        return partner
+    m = _PARTNER_RE.match(name)
     if not m:
         return None
     base, num_str, suffix = m.group(1), m.group(2), m.group(3) or ''
@@ -509,76 +882,407 @@ def find_partner_platform_id(platform_name: str | None) -> str | None:
         num = int(num_str)
     except ValueError:
         return None
-    partner_map = {1: 3, 2: 4, 3: 1, 4: 2}
-    partner_num = partner_map.get(num)
+    partner_num = _PARTNER_NUMBERS.get(num)
     if partner_num is None:
         return None
     return f"{base} {partner_num}{suffix}".strip()
 
 
-def coerce_label_list(value) -> list[str]:
+def normalize_label_list(value) -> list[str]:
+    """Normalize a stored label field (comma-separated string, list, or scalar) to platform labels."""
     if not value:
         return []
-    if isinstance(value, list):
-        return [str(v) for v in value if v]
     if isinstance(value, str):
-        return [part.strip() for part in value.split(',') if part.strip()]
-    return [str(value)]
+        labels = (part.strip() for part in value.split(','))
+    elif isinstance(value, list):
+        labels = (str(v) for v in value if v)
+    else:
+        labels = (str(value),)
+    # Label sets repeat across rows, so the per-label regex work is memoized.
+    return [normalize_platform_label(label) for label in labels if label]
+
+
+# operations_log.txt historically is at api/operations_log.txt
+OPERATIONS_LOG_FILE = os.path.join(API_DIR, '..', 'operations_log.txt')
+if not os.path.isabs(OPERATIONS_LOG_FILE):
+    OPERATIONS_LOG_FILE = os.path.join(API_DIR, 'operations_log.txt')
+
+# log_action only enqueues; a daemon writer coalesces entries into one insert_many
+# and one file append per flush, so request handlers never wait on Mongo or disk.
+LOG_FLUSH_INTERVAL = 0.25
+LOG_FLUSH_MAX_BATCH = 500
+# None on the queue tells the writer to finish its batch and exit (shutdown).
+_log_queue: queue.Queue[dict | None] = queue.Queue()
+_log_writer_lock = threading.Lock()
+_log_writer: threading.Thread | None = None
+# Seconds shutdown waits for the writer to finish before giving up on the drain.
+LOG_WRITER_JOIN_TIMEOUT = 5.0
+# Long-lived append handle; writes and close are serialized on _log_file_lock.
+_log_file = None
+_log_file_lock = threading.Lock()
+
+
+def _log_file_handle():
+    global _log_file
+    if _log_file is None or _log_file.closed:
+        _log_file = open(OPERATIONS_LOG_FILE, 'a', encoding='utf-8', buffering=64 * 1024)
+    return _log_file
+
+
+@atexit.register
+def _close_log_file():
+    with _log_file_lock:
+        if _log_file is not None and not _log_file.closed:
+            try:
+                _log_file.close()
+            except Exception:
+                pass
 
 
-def log_action(action_string: str):
+def _write_log_batch(batch: list[dict]):
     # Persist to Mongo
-    entry = {"timestamp": datetime.now(), "action": action_string}
     try:
-        logs_collection.insert_one(entry)
+        logs_collection.insert_many(batch, ordered=False)
     except Exception:
         pass
     # Also append to text operations log for quick inspection
     try:
-        log_path = os.path.join(API_DIR, '..', 'operations_log.txt')
-        # operations_log.txt historically is at api/operations_log.txt; ensure path
-        if not os.path.isabs(log_path):
-            log_path = os.path.join(API_DIR, 'operations_log.txt')
-        with open(log_path, 'a', encoding='utf-8') as lf:
-            lf.write(f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S')} | {action_string}\n")
+        text = ''.join(f"{e['timestamp'].strftime('%Y-%m-%d %H:%M:%S')} | {e['action']}\n" for e in batch)
+        with _log_file_lock:
+            lf = _log_file_handle()
+            lf.write(text)
+            lf.flush()
     except Exception:
         pass
 
 
+def _log_writer_loop():
+    stop = False
+    while not stop:
+        entry = _log_queue.get()
+        if entry is None:
+            return
+        batch = [entry]
+        deadline = time.monotonic() + LOG_FLUSH_INTERVAL
+        while len(batch) < LOG_FLUSH_MAX_BATCH:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                entry = _log_queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if entry is None:
+                stop = True
+                break
+            batch.append(entry)
+        _write_log_batch(batch)
+
+
+def drain_log_queue():
+    """Stop the writer thread, then write out whatever is still queued (used at shutdown)."""
+    writer = _log_writer
+    if writer is not None and writer.is_alive():
+        _log_queue.put_nowait(None)
+        writer.join(LOG_WRITER_JOIN_TIMEOUT)
+        if writer.is_alive():
+            # Still blocked on Mongo; it keeps the queue rather than race it.
+            return
+    batch = []
+    while True:
+        try:
+            entry = _log_queue.get_nowait()
+        except queue.Empty:
+            break
+        if entry is None:
+            continue
+        batch.append(entry)
+        if len(batch) >= LOG_FLUSH_MAX_BATCH:
+            _write_log_batch(batch)
+            batch = []
+    if batch:
+        _write_log_batch(batch)
+
+
+def _ensure_log_writer():
+    global _log_writer
+    if _log_writer is not None and _log_writer.is_alive():
+        return
+    with _log_writer_lock:
+        if _log_writer is None or not _log_writer.is_alive():
+            _log_writer = threading.Thread(target=_log_writer_loop, name='log-writer', daemon=True)
+            _log_writer.start()
+
+
+def log_action(action_string: str):
+    _log_queue.put_nowait({"timestamp": datetime.now(), "action": action_string})
+    if _log_writer is None:
+        _ensure_log_writer()
+
+
 refresh_train_cache()
 
 
-def persist_state(state_doc: dict):
-    """Persist the station state to Mongo.
-    Separated into a function so we can schedule it as a background task to avoid
-    blocking the request/response cycle on slow network I/O.
-    """
-    try:
-        state_collection.replace_one({"_id": "current_station_state"}, state_doc, upsert=True)
-    except Exception:
-        # Intentionally swallow errors in background to avoid surfacing to users
-        # (operational logs in Mongo/Render console will still show failures)
-        pass
+# --- Station state cache (write-through) ---
+# Handlers read the station state from memory and every save goes to the cache and
+# Mongo together, so a request costs at most one round trip. Each targeted update bumps
+# `_version` and only applies to the version the cache holds, so a write from another
+# process is detected (409) instead of being silently overwritten.
+# `persisted` records whether the loaded doc exists in Mongo; only a missing doc is upserted.
+_state_cache: dict = {"doc": None, "persisted": False, "lock": threading.RLock()}
+# List fields guaranteed present on the cached state, so handlers index them directly.
+_STATE_LIST_KEYS = ('platforms', 'waitingList', 'arrivingTrains')
+
+
+def get_state() -> dict:
+    """Return the cached station state, loading it from Mongo on first use."""
+    with _state_cache['lock']:
+        if _state_cache['doc'] is None:
+            found = state_collection.find_one({"_id": "current_station_state"})
+            doc = found or {}
+            for key in _STATE_LIST_KEYS:
+                if not doc.get(key):
+                    doc[key] = []
+            _state_cache['doc'] = doc
+            _state_cache['persisted'] = found is not None
+        return _state_cache['doc']
+
+
+def update_state(state: dict, update: dict):
+    """Persist a targeted update whose effect is already applied to the cached `state`."""
+    with _state_cache['lock']:
+        doc = _state_cache['doc']
+        if doc is None or doc is not state:
+            # `state` was dropped (conflict or failed write) after the update was computed
+            # against it; its array indexes may not match what Mongo holds now.
+            raise HTTPException(status_code=409, detail="Station state changed concurrently; please retry.")
+        version = doc.get('_version')
+        update = {**update, "$inc": {"_version": 1}}
+        try:
+            if _state_cache['persisted']:
+                result = state_collection.update_one({"_id": "current_station_state", "_version": version}, update)
+            else:
+                result = state_collection.update_one({"_id": "current_station_state"}, update, upsert=True)
+        except Exception:
+            _state_cache['doc'] = None
+            raise
+        if not result.matched_count and result.upserted_id is None:
+            # Someone else wrote the state since we loaded it; drop our copy.
+            _state_cache['doc'] = None
+            raise HTTPException(status_code=409, detail="Station state changed concurrently; please retry.")
+        doc['_id'] = "current_station_state"
+        doc['_version'] = (version or 0) + 1
+        _state_cache['persisted'] = True
+
+
+# Blocking station-state I/O from request handlers runs on one dedicated thread: the
+# event loop is not held up by Mongo round trips, and updates still reach Mongo in the
+# order the handlers applied them to the cached state.
+_state_io_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='state-io')
+
+
+async def _state_io(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(_state_io_executor, fn, *args)
+
+
+async def get_state_async() -> dict:
+    doc = _state_cache['doc']
+    return doc if doc is not None else await _state_io(get_state)
+
+
+async def update_state_async(state: dict, update: dict):
+    await _state_io(update_state, state, update)
+
+
+def _platform_positions(state: dict) -> dict[str, int]:
+    """Map platform id -> index in `state['platforms']` (first occurrence wins)."""
+    positions: dict[str, int] = {}
+    for i, p in enumerate(state['platforms']):
+        positions.setdefault(p.get('id'), i)
+    return positions
+
+
+def _platform_updates(state: dict, platform_ids, positions: dict[str, int] | None = None) -> dict:
+    """`$set` entries rewriting just the given platforms, addressed by array index."""
+    if positions is None:
+        positions = _platform_positions(state)
+    platforms = state['platforms']
+    return {f"platforms.{positions[pid]}": platforms[positions[pid]] for pid in platform_ids if pid in positions}
+
+
+def reset_state_cache():
+    """Drop the cached state so the next get_state() reloads it from Mongo."""
+    with _state_cache['lock']:
+        _state_cache['doc'] = None
+
+
+def _csv_writer_loop():
+    while True:
+        with _csv_cv:
+            while True:
+                if not _csv_pending:
+                    _csv_cv.wait()
+                    continue
+                date_str, due = min(_csv_pending.items(), key=lambda item: item[1])
+                delay = due - time.monotonic()
+                if delay > 0:
+                    _csv_cv.wait(delay)
+                    continue
+                del _csv_pending[date_str]
+                break
+        write_csv_for_date(date_str)
 
 
 def schedule_csv_write(date_str: str):
     """Debounce CSV generation for a date; runs ~1s after last schedule."""
-    def _run():
+    global _csv_thread
+    with _csv_cv:
+        _csv_pending[date_str] = time.monotonic() + CSV_WRITE_DEBOUNCE
+        if _csv_thread is None or not _csv_thread.is_alive():
+            _csv_thread = threading.Thread(target=_csv_writer_loop, name='csv-writer', daemon=True)
+            _csv_thread.start()
+        _csv_cv.notify()
+
+
+# "Update the latest report entry" writes are coalesced per (date, trainNo) and
+# applied together every REPORT_FLUSH_INTERVAL seconds. Anything that appends or
+# reads report rows flushes first, so callers always see their own updates.
+REPORT_FLUSH_INTERVAL = 0.5
+# Flushes a failed batch is retried for before it is dropped (and logged).
+REPORT_FLUSH_MAX_ATTEMPTS = 5
+_pending_report_updates: dict[tuple[str, str], dict] = {}
+# Batches whose flush failed: [report _id or None if not yet resolved, key, fields, attempts].
+# Once resolved the _id stays pinned, so a row appended later never receives them.
+_report_update_retries: list[list] = []
+_report_updates_lock = threading.Lock()
+_report_flush_lock = threading.Lock()
+_report_flush_timer: threading.Timer | None = None
+
+
+def _arm_report_flush_timer():
+    """Start the flush timer if none is pending; caller holds _report_updates_lock."""
+    global _report_flush_timer
+    if _report_flush_timer is None:
+        t = threading.Timer(REPORT_FLUSH_INTERVAL, flush_report_updates)
+        t.daemon = True
+        _report_flush_timer = t
+        t.start()
+
+
+def queue_report_update_if_exists(train_no, update_fields, date_str=None):
+    """Queue a `$set` for the latest report entry of a train/day (no insert if missing)."""
+    if not train_no:
+        return
+    key = (date_str or _today_str(), str(train_no))
+    with _report_updates_lock:
+        pending = _pending_report_updates.get(key)
+        if pending is None:
+            _pending_report_updates[key] = dict(update_fields or {})
+        else:
+            pending.update(update_fields or {})
+        _arm_report_flush_timer()
+
+
+def _latest_report_ids(keys) -> dict[tuple[str, str], object]:
+    """Map (date, trainNo) to the _id of its most recent report entry."""
+    by_date: dict[str, list[str]] = {}
+    for date_key, train_no in keys:
+        by_date.setdefault(date_key, []).append(train_no)
+    latest: dict[tuple[str, str], tuple] = {}
+    for date_key, train_nos in by_date.items():
+        cursor = reports_collection.find(
+            {"date": date_key, "trainNo": {"$in": train_nos}},
+            {"_id": 1, "trainNo": 1, "event_time": 1},
+        )
+        for doc in cursor:
+            event_time = doc.get('event_time')
+            # Same precedence as sort=[('event_time', -1), ('_id', -1)]; missing times sort lowest.
+            rank = (event_time is not None, str(event_time or ''), doc['_id'])
+            key = (date_key, doc.get('trainNo'))
+            current = latest.get(key)
+            if current is None or rank > current:
+                latest[key] = rank
+    return {key: rank[2] for key, rank in latest.items()}
+
+
+def flush_report_updates() -> bool:
+    """Apply queued report updates with one lookup per date and a single bulk_write.
+
+    Returns False if the batch could not be applied; it is then retried by the timer.
+    """
+    global _report_flush_timer
+    with _report_flush_lock:
+        with _report_updates_lock:
+            pending = dict(_pending_report_updates)
+            _pending_report_updates.clear()
+            retries = list(_report_update_retries)
+            _report_update_retries.clear()
+            timer, _report_flush_timer = _report_flush_timer, None
+        if timer is not None:
+            timer.cancel()
+        # Older (retried) batches first so newer fields win when both hit one row.
+        batch = retries + [[None, key, fields, 0] for key, fields in pending.items()]
+        if not batch:
+            return True
         try:
-            write_csv_for_date(date_str)
-        finally:
-            with csv_timers_lock:
-                csv_timers.pop(date_str, None)
+            unresolved = {item[1] for item in batch if item[0] is None}
+            latest = _latest_report_ids(unresolved) if unresolved else {}
+        except Exception:
+            _requeue_report_updates(batch)
+            return False
+        # Updates for a train with no report row have nothing to apply to.
+        batch = [item for item in batch if item[0] is not None or item[1] in latest]
+        for item in batch:
+            if item[0] is None:
+                item[0] = latest[item[1]]
+        merged: dict[object, dict] = {}
+        for report_id, key, fields, _ in batch:
+            merged.setdefault(report_id, {"date": key[0], "trainNo": key[1]}).update(fields)
+        try:
+            if merged:
+                reports_collection.bulk_write(
+                    [UpdateOne({"_id": report_id}, {"$set": fields}) for report_id, fields in merged.items()],
+                    ordered=False,
+                )
+        except Exception:
+            _requeue_report_updates(batch)
+            return False
+        for date_key in {item[1][0] for item in batch}:
+            schedule_csv_write(date_key)
+        return True
 
-    with csv_timers_lock:
-        if date_str in csv_timers:
-            try:
-                csv_timers[date_str].cancel()
-            except Exception:
-                pass
-        t = threading.Timer(1.0, _run)
-        csv_timers[date_str] = t
-        t.start()
+
+def _requeue_report_updates(batch: list[list]):
+    """Keep a failed batch for the next flush, dropping items that used up their attempts."""
+    kept = []
+    for report_id, key, fields, attempts in batch:
+        if attempts + 1 >= REPORT_FLUSH_MAX_ATTEMPTS:
+            log_action(f"REPORT UPDATE DROPPED: {key[1]} on {key[0]} after {attempts + 1} failed flushes ({sorted(fields)}).")
+            continue
+        kept.append([report_id, key, fields, attempts + 1])
+    with _report_updates_lock:
+        _report_update_retries[:0] = kept
+        if _report_update_retries or _pending_report_updates:
+            _arm_report_flush_timer()
+
+
+def _pin_report_update_retries(key: tuple[str, str]):
+    """Bind retried updates for `key` to its current latest row before a newer row is appended."""
+    with _report_updates_lock:
+        if not any(item[0] is None and item[1] == key for item in _report_update_retries):
+            return
+    # Raises if Mongo is unreachable; the caller's insert must not run then.
+    report_id = _latest_report_ids([key]).get(key)
+    with _report_updates_lock:
+        remaining = []
+        for item in _report_update_retries:
+            if item[0] is None and item[1] == key:
+                if report_id is None:
+                    # No existing row: the update must not land on the one about to be added.
+                    continue
+                item[0] = report_id
+            remaining.append(item)
+        _report_update_retries[:] = remaining
 
 
 def persist_report_update(train_no: str, update_fields: dict):
@@ -611,12 +1315,11 @@ def persist_report_update_if_exists(train_no: str, update_fields: dict):
     """Update the latest report entry only if one already exists.
 
     This is used for non-state-changing actions like computing suggestions, where
-    we do not want to create a standalone report row.
+    we do not want to create a standalone report row. The write is coalesced and
+    CSV generation is scheduled when it is flushed.
     """
     try:
-        updated = update_latest_daily_report_if_exists(train_no, update_fields)
-        if updated:
-            schedule_csv_write(_today_str())
+        queue_report_update_if_exists(train_no, update_fields)
     except Exception:
         pass
 
@@ -634,55 +1337,34 @@ def get_next_freight_tag(date_str: str | None = None) -> str:
     return f"F{counter_val}"
 
 
+def _update_latest_report(train_no, update_fields, date_key: str) -> bool:
+    """Set fields on the newest report row for the train/day in one round trip."""
+    matched = reports_collection.find_one_and_update(
+        {"date": date_key, "trainNo": str(train_no)},
+        {"$set": {**(update_fields or {}), "date": date_key, "trainNo": str(train_no)}},
+        projection={'_id': 1},
+        sort=[('event_time', -1), ('_id', -1)],
+    )
+    return matched is not None
+
+
 def upsert_daily_report(train_no, update_fields, date_str=None):
     if not train_no:
         return
     date_key = date_str or _today_str()
+    flush_report_updates()
 
     # Update only the most recent entry for this train/day.
     # If none exists yet (older data / edge cases), create a baseline entry.
-    query = {"date": date_key, "trainNo": str(train_no)}
-    latest = None
-    try:
-        latest = reports_collection.find_one(query, sort=[('event_time', -1), ('_id', -1)])
-    except Exception:
-        latest = reports_collection.find_one(query)
-
-    if latest and latest.get('_id') is not None:
-        reports_collection.update_one(
-            {"_id": latest['_id']},
-            {"$set": {**update_fields, "date": date_key, "trainNo": str(train_no)}},
-            upsert=False,
-        )
+    if _update_latest_report(train_no, update_fields, date_key):
         return
 
     # No existing entry; create one so updates aren't lost.
     doc = {**update_fields, "date": date_key, "trainNo": str(train_no)}
-    doc.setdefault('event_time', datetime.utcnow().isoformat())
+    doc.setdefault('event_time', _utc_now_iso())
     reports_collection.insert_one(doc)
 
 
-def update_latest_daily_report_if_exists(train_no, update_fields, date_str=None):
-    """Update the latest entry for the train/day; no insert if missing."""
-    if not train_no:
-        return False
-    date_key = date_str or _today_str()
-    query = {"date": date_key, "trainNo": str(train_no)}
-    latest = None
-    try:
-        latest = reports_collection.find_one(query, sort=[('event_time', -1), ('_id', -1)])
-    except Exception:
-        latest = reports_collection.find_one(query)
-    if not latest or latest.get('_id') is None:
-        return False
-    reports_collection.update_one(
-        {"_id": latest['_id']},
-        {"$set": {**(update_fields or {}), "date": date_key, "trainNo": str(train_no)}},
-        upsert=False,
-    )
-    return True
-
-
 def persist_suggestions_snapshot(train_no: str, suggestion_fields: dict):
     """Persist suggestions for a train without creating a standalone report row.
 
@@ -694,9 +1376,9 @@ def persist_suggestions_snapshot(train_no: str, suggestion_fields: dict):
     date_key = _today_str()
     fields = suggestion_fields or {}
     try:
-        updated = update_latest_daily_report_if_exists(train_no, fields, date_key)
+        queue_report_update_if_exists(train_no, fields, date_key)
     except Exception:
-        updated = False
+        pass
 
     # Always upsert the cache so the next assignment row can merge suggestions,
     # even when a report entry already exists (e.g., train moved to waiting list and reassigned).
@@ -708,7 +1390,7 @@ def persist_suggestions_snapshot(train_no: str, suggestion_fields: dict):
                     **fields,
                     "date": date_key,
                     "trainNo": str(train_no),
-                    "updated_at": datetime.utcnow().isoformat(),
+                    "updated_at": _utc_now_iso(),
                 }
             },
             upsert=True,
@@ -716,13 +1398,6 @@ def persist_suggestions_snapshot(train_no: str, suggestion_fields: dict):
     except Exception:
         pass
 
-    # If we updated the latest report entry too, schedule CSV generation.
-    if updated:
-        try:
-            schedule_csv_write(date_key)
-        except Exception:
-            pass
-
 
 def persist_assignment_report_entry(train_no: str, entry_fields: dict):
     """Insert a new assignment/reassignment report entry.
@@ -759,11 +1434,43 @@ def persist_assignment_report_entry(train_no: str, entry_fields: dict):
         pass
 
 
+def carry_forward_report_suggestions(train_no: str):
+    """Copy suggestions from the latest report row into the suggestions cache.
+
+    Lets the next assignment row include them even if the operator doesn't
+    recompute suggestions (e.g. after an unassign).
+    """
+    try:
+        latest_report = get_latest_report_entry_for_today(train_no) or {}
+        suggestions_field = latest_report.get('suggestions')
+        if not suggestions_field:
+            suggestions_field = latest_report.get('top3_suggestions')
+        incoming_line_for_cache = latest_report.get('incoming_line') or ''
+        if suggestions_field:
+            date_key = _today_str()
+            suggestions_cache_collection.update_one(
+                {"date": date_key, "trainNo": str(train_no)},
+                {
+                    "$set": {
+                        "date": date_key,
+                        "trainNo": str(train_no),
+                        "suggestions": suggestions_field,
+                        "incoming_line": incoming_line_for_cache,
+                        "updated_at": _utc_now_iso(),
+                    }
+                },
+                upsert=True,
+            )
+    except Exception:
+        pass
+
+
 def get_latest_report_entry_for_today(train_no: str) -> dict | None:
     """Fetch the latest report entry for a train for today (if any)."""
     if not train_no:
         return None
     date_key = _today_str()
+    flush_report_updates()
     query = {"date": date_key, "trainNo": str(train_no)}
     try:
         return reports_collection.find_one(query, {"_id": 0}, sort=[('event_time', -1), ('_id', -1)])
@@ -782,107 +1489,157 @@ def append_daily_report_entry(train_no, entry_fields, date_str=None):
     if not train_no:
         return
     date_key = date_str or _today_str()
+    # Pending updates target the current latest entry; apply them before a newer one exists.
+    if not flush_report_updates():
+        _pin_report_update_retries((date_key, str(train_no)))
     doc = {**(entry_fields or {}), "date": date_key, "trainNo": str(train_no)}
-    doc.setdefault('event_time', datetime.utcnow().isoformat())
+    doc.setdefault('event_time', _utc_now_iso())
     # For assignment entries we keep Remarks empty unless explicitly provided.
     if 'Remarks' not in doc:
         doc['Remarks'] = ''
     reports_collection.insert_one(doc)
 
 
+def _new_report_csv_writer():
+    """Return `(bytes_buffer, writer)`; quoting, joining and UTF-8 encoding all run in C."""
+    out = io.BytesIO()
+    text = io.TextIOWrapper(out, encoding='utf-8', newline='', write_through=True)
+    return out, csv.writer(text, quoting=csv.QUOTE_MINIMAL, lineterminator='\n')
+
+
+def _report_csv_row(r: dict) -> tuple:
+    """Format one daily-report document as a row in REPORT_CSV_HEADERS order."""
+    suggestions_field = r.get('suggestions') or r.get('top3_suggestions', [])
+    normalized_suggestions = ', '.join(normalize_label_list(suggestions_field))
+    actual_platform_field = r.get('actual_platform', '')
+    normalized_actual_platform = ', '.join(normalize_label_list(actual_platform_field)) if actual_platform_field else ''
+    train_name = r.get('trainName') or ''
+    if ',' in train_name:
+        train_name = train_name.replace(',', ' ')
+    # Columns are fixed, so the row is built as one tuple literal (kept in
+    # REPORT_CSV_HEADERS order) with no intermediate merged dict. Only trainNo
+    # can arrive as a number; csv.writer stringifies the rest itself.
+    get = r.get
+    train_no = get('trainNo', '')
+    if type(train_no) is not str:
+        train_no = str(train_no)
+    return (
+        get('date', ''), train_no, train_name,
+        get('scheduled_arrival', ''), get('scheduled_departure', ''),
+        get('actual_arrival', ''), get('actual_departure', ''), get('actual_platform_arrival', ''),
+        normalized_suggestions, normalized_actual_platform,
+        get('incoming_line', ''), get('outgoing_line', ''), get('Remarks', ''),
+    )
+
+
+def _write_report_rows(writerows, batch: list) -> bool:
+    """Write `batch` as CSV rows; True when the cursor may still hold more documents."""
+    writerows(map(_report_csv_row, batch))
+    return len(batch) >= CSV_CURSOR_BATCH_SIZE
+
+
+def _write_next_report_batch(cursor, writerows) -> bool:
+    return _write_report_rows(writerows, _next_cursor_batch(cursor))
+
+
+def _daily_csv_row(r: dict) -> tuple:
+    suggestions_field = r.get('suggestions')
+    if not suggestions_field:
+        suggestions_field = r.get('top3_suggestions', [])
+    normalized_suggestions = normalize_label_list(suggestions_field)
+    actual_platform_field = r.get('actual_platform', '')
+    normalized_actual_platform = ', '.join(normalize_label_list(actual_platform_field)) if actual_platform_field else ''
+    get = r.get
+    return (
+        get('date', ''), get('trainNo', ''), get('trainName', ''),
+        get('scheduled_arrival', ''), get('scheduled_departure', ''),
+        get('actual_arrival', ''), get('actual_departure', ''), get('actual_platform_arrival', ''),
+        ', '.join(normalized_suggestions), normalized_actual_platform,
+        get('incoming_line', ''), get('outgoing_line', ''), get('Remarks', ''),
+    )
+
+
 def write_csv_for_date(date_str):
     try:
-        rows = list(
+        flush_report_updates()
+        cursor = (
             reports_collection
-            .find({"date": date_str}, {"_id": 0})
+            .find({"date": date_str}, REPORT_CSV_PROJECTION)
             .sort([("trainNo", 1), ("event_time", 1)])
+            .batch_size(CSV_CURSOR_BATCH_SIZE)
         )
         csv_path = os.path.join(API_DIR, 'reports', f"{date_str}.csv")
         os.makedirs(os.path.dirname(csv_path), exist_ok=True)
-        headers = [
-            'date', 'trainNo', 'trainName', 'scheduled_arrival', 'scheduled_departure',
-            'actual_arrival', 'actual_departure', 'actual_platform_arrival', 'suggestions', 'actual_platform',
-            'incoming_line', 'outgoing_line', 'Remarks' 
-        ]
-        with open(csv_path, 'w', newline='', encoding='utf-8') as f:
-            import csv as _csv
-            writer = _csv.DictWriter(f, fieldnames=headers)
-            writer.writeheader()
-            for r in rows:
-                suggestions_field = r.get('suggestions')
-                if not suggestions_field:
-                    suggestions_field = r.get('top3_suggestions', [])
-                normalized_suggestions = normalize_platform_labels(coerce_label_list(suggestions_field))
-                actual_platform_field = r.get('actual_platform', '')
-                normalized_actual_platform = ', '.join(normalize_platform_labels(coerce_label_list(actual_platform_field))) if actual_platform_field else ''
-                writer.writerow({
-                    'date': r.get('date', ''),
-                    'trainNo': r.get('trainNo', ''),
-                    'trainName': r.get('trainName', ''),
-                    'scheduled_arrival': r.get('scheduled_arrival', ''),
-                    'scheduled_departure': r.get('scheduled_departure', ''),
-                    'actual_arrival': r.get('actual_arrival', ''),
-                    'actual_departure': r.get('actual_departure', ''),
-                    'actual_platform_arrival': r.get('actual_platform_arrival', ''),
-                    'suggestions': ', '.join(normalized_suggestions),
-                    'actual_platform': normalized_actual_platform,
-                    'incoming_line': r.get('incoming_line', ''),
-                    'outgoing_line': r.get('outgoing_line', ''),
-                    'Remarks': r.get('Remarks', ''),
-                })
+        try:
+            with open(csv_path, 'w', newline='', encoding='utf-8') as f:
+                writer = csv.writer(f)
+                writer.writerow(REPORT_CSV_HEADERS)
+                # Hand rows to the csv module in chunks so memory stays O(chunk), not O(day).
+                rows = map(_daily_csv_row, cursor)
+                while chunk := list(itertools.islice(rows, DAILY_CSV_WRITE_CHUNK)):
+                    writer.writerows(chunk)
+        finally:
+            cursor.close()
     except Exception:
         pass
 
 
-def enforce_track_layout(state: dict) -> dict:
+async def enforce_track_layout(state: dict) -> dict:
     """Ensure only allowed tracks exist and attach friendly display names."""
     if not state:
         return state
-    platforms = state.get('platforms', []) or []
-    waiting = state.setdefault('waitingList', []) or []
-    waiting_nos = {str(item.get('trainNo')) for item in waiting if item.get('trainNo')}
+    platforms = state['platforms']
+    waiting = state['waitingList']
+
+    def _track_needs_fix(entry) -> bool:
+        pid = entry.get('id') if isinstance(entry, dict) else None
+        if not pid or not pid.startswith('Track'):
+            return False
+        # TRACK_LABELS doubles as the allow-list: one lookup answers both questions.
+        friendly = TRACK_LABELS.get(pid)
+        return friendly is None or entry.get('displayName') != friendly
+
+    # Steady state: layout already clean, nothing to copy or persist.
+    if not any(map(_track_needs_fix, platforms)):
+        return state
+
+    waiting_nos = None
     normalized = []
     changed = False
     for entry in platforms:
         pid = entry.get('id') if isinstance(entry, dict) else None
         if pid and pid.startswith('Track'):
-            if pid not in ALLOWED_TRACK_IDS:
+            friendly = TRACK_LABELS.get(pid)
+            if friendly is None:
                 train_details = entry.get('trainDetails') if isinstance(entry, dict) else None
                 train_no = str(train_details.get('trainNo')) if train_details and train_details.get('trainNo') else None
+                if train_no and waiting_nos is None:
+                    waiting_nos = {str(item.get('trainNo')) for item in waiting if item.get('trainNo')}
                 if train_no and train_no not in waiting_nos:
+                    enqueued = datetime.now().astimezone()
                     waiting.append({
                         'trainNo': train_no,
                         'name': train_details.get('name'),
-                        'enqueued_at': datetime.now().astimezone().isoformat(),
+                        'enqueued_at': enqueued.isoformat(),
+                        'enqueued_ms': int(enqueued.timestamp() * 1000),
                         'actualArrival': entry.get('actualArrival'),
                         'incoming_line': train_details.get('incomingLine') or train_details.get('incoming_line') or ''
                     })
                     waiting_nos.add(train_no)
                 changed = True
                 continue
-            friendly = TRACK_LABELS.get(pid)
-            if friendly and entry.get('displayName') != friendly:
+            if entry.get('displayName') != friendly:
                 entry = dict(entry)
                 entry['displayName'] = friendly
                 changed = True
         normalized.append(entry)
     if changed:
         state['platforms'] = normalized
-        # Keep waiting list FCFS ordered by enqueued_at
-        try:
-            def _wl_key(item: dict):
-                enq = item.get('enqueued_at') or ''
-                try:
-                    dt = datetime.fromisoformat(enq)
-                    return (dt.timestamp(), str(item.get('trainNo') or ''))
-                except Exception:
-                    return (enq, str(item.get('trainNo') or ''))
-            waiting.sort(key=_wl_key)
-        except Exception:
-            pass
+        # Keep waiting list FCFS ordered by enqueue time
+        waiting.sort(key=_waiting_sort_key)
         state['waitingList'] = waiting
         try:
-            state_collection.replace_one({"_id": "current_station_state"}, state, upsert=True)
+            await update_state_async(state, {"$set": {"platforms": state['platforms'], "waitingList": waiting}})
         except Exception:
             pass
     return state
@@ -946,109 +1703,227 @@ def _build_initial_platforms_from_master() -> list[dict]:
         return _default_platforms()
 
 
-def _ensure_state_platforms_present(state: dict | None = None) -> dict:
+async def _ensure_state_platforms_present(state: dict) -> dict:
     """Ensure station_state has a non-empty platforms list (repairs accidental empty array)."""
-    if state is None:
-        state = state_collection.find_one({"_id": "current_station_state"}) or {}
-    if state.get('platforms'):
+    if state['platforms']:
         return state
 
-    platforms_list = _build_initial_platforms_from_master()
+    platforms_list = await run_in_threadpool(_build_initial_platforms_from_master)
     state['platforms'] = platforms_list
     try:
-        state_collection.replace_one({"_id": "current_station_state"}, state, upsert=True)
+        await update_state_async(state, {"$set": {"platforms": platforms_list}})
     except Exception:
         pass
     return state
 
 
+def _index_signature() -> str:
+    return '|'.join(
+        f"{coll_name}:{model.document['name']}"
+        for coll_name in sorted(EXPECTED_INDEXES)
+        for model in EXPECTED_INDEXES[coll_name]
+    )
+
+
+def _ensure_indexes():
+    """Create missing indexes from EXPECTED_INDEXES with one `create_indexes` per collection.
+
+    A sentinel doc stores the signature of the last applied index set, so warm
+    restarts cost a single `find_one` instead of one round trip per index.
+    """
+    signature = _index_signature()
+    try:
+        meta = schema_meta_collection.find_one({"_id": "indexes"}) or {}
+        if meta.get('signature') == signature:
+            return
+    except Exception:
+        pass
+
+    for coll_name, models in EXPECTED_INDEXES.items():
+        coll = db[coll_name]
+        try:
+            info = coll.index_information() or {}
+        except Exception:
+            info = {}
+        if coll_name == 'daily_reports':
+            # Drop the legacy unique (date, trainNo) index left by older deployments.
+            for idx_name, spec in list(info.items()):
+                try:
+                    if spec.get('unique') and list(spec.get('key') or []) == [('date', 1), ('trainNo', 1)]:
+                        coll.drop_index(idx_name)
+                        info.pop(idx_name, None)
+                except Exception:
+                    pass
+        missing = [m for m in models if m.document['name'] not in info]
+        if not missing:
+            continue
+        try:
+            coll.create_indexes(missing)
+        except Exception:
+            return
+
+    try:
+        schema_meta_collection.replace_one(
+            {"_id": "indexes"},
+            {"_id": "indexes", "signature": signature},
+            upsert=True,
+        )
+    except Exception:
+        pass
+
+
+def _index_platforms(state: dict) -> dict[str, dict]:
+    """Map platform id -> platform entry (same dict objects as in `state['platforms']`).
+
+    Like `_platform_positions`, the first entry wins if an id repeats, so both
+    lookups always address the same platform.
+    """
+    platforms_by_id: dict[str, dict] = {}
+    for p in state['platforms']:
+        platforms_by_id.setdefault(p.get('id'), p)
+    return platforms_by_id
+
+
+def _clear_platform(platforms_by_id: dict[str, dict], pid: str | None):
+    """Free a platform in the cached state.
+
+    Returns `(train_details, linked_platform_id)`, or `(None, None)` if the
+    platform is unknown or not occupied. Callers cancel the departure timer
+    once the cleared state has been persisted.
+    """
+    platform_to_clear = platforms_by_id.get(pid)
+    if not platform_to_clear or not platform_to_clear.get('isOccupied'):
+        return None, None
+    train_details = platform_to_clear.get('trainDetails')
+    linked_platform_id = train_details.get('linkedPlatformId') if train_details else None
+    platform_to_clear['isOccupied'] = False
+    platform_to_clear['trainDetails'] = None
+    platform_to_clear['actualArrival'] = None
+    return train_details, linked_platform_id
+
+
+def _clear_long_train_partner(platforms_by_id: dict[str, dict], platform_id: str, train_details: dict, cleared: list[str]):
+    """Fallback for long trains whose partner platform was not recorded via linkedPlatformId."""
+    train_data = get_train_record(str(train_details.get('trainNo')))
+    if str(train_data.get('LENGTH', '')).strip().lower() != 'long':
+        return
+    partner_guess = find_partner_platform_id(platform_id)
+    partner_obj = platforms_by_id.get(partner_guess) if partner_guess else None
+    partner_details = partner_obj.get('trainDetails') if partner_obj and partner_obj.get('isOccupied') else None
+    if partner_details and partner_details.get('trainNo') == train_details.get('trainNo'):
+        _clear_platform(platforms_by_id, partner_guess)
+        cleared.append(partner_guess)
+
+
+def _clear_train_platforms(platforms_by_id: dict[str, dict], platform_id: str | None):
+    """Free `platform_id` and any partner platform held by the same train.
+
+    Returns `(train_details, cleared_platform_ids)`; `train_details` is None if
+    the platform is unknown or not occupied.
+    """
+    train_details, linked_platform_id = _clear_platform(platforms_by_id, platform_id)
+    if not train_details:
+        return None, []
+    cleared = [platform_id]
+    if linked_platform_id:
+        _clear_platform(platforms_by_id, linked_platform_id)
+        cleared.append(linked_platform_id)
+    else:
+        _clear_long_train_partner(platforms_by_id, platform_id, train_details, cleared)
+    return train_details, cleared
+
+
 # ---------- FastAPI lifecycle ----------
 
+def _bootstrap_station_state():
+    """Create the station state from the platforms/trains masters if it does not exist yet."""
+    if state_collection.count_documents({}) != 0:
+        return
+    try:
+        platforms_master_raw = list(platforms_collection.find({}, {'_id': 0}))
+        if len(platforms_master_raw) == 1 and 'tracks' in platforms_master_raw[0]:
+            platforms_master = platforms_master_raw[0]['tracks']
+        else:
+            platforms_master = platforms_master_raw
+        trains_master = trains_collection.find(
+            {},
+            {'_id': 0, 'TRAIN NO': 1, 'TRAIN NAME': 1, 'ARRIVAL AT KGP': 1, 'DEPARTURE FROM KGP': 1},
+        )
+        initial_platforms = []
+        for track_data in platforms_master:
+            is_platform = track_data.get('is_platform', False)
+            item_id = track_data['id'].replace('P', '').replace('T', '')
+            initial_platforms.append({
+                'id': f"Platform {item_id}" if is_platform else f"Track {item_id}",
+                'isOccupied': False,
+                'trainDetails': None,
+                'isUnderMaintenance': False,
+                'actualArrival': None
+            })
+        initial_schedule = [
+            {
+                'trainNo': str(row['TRAIN NO']),
+                'name': row['TRAIN NAME'],
+                'scheduled_arrival': row.get('ARRIVAL AT KGP'),
+                'scheduled_departure': row.get('DEPARTURE FROM KGP')
+            }
+            for row in trains_master
+        ]
+        initial_state = {
+            '_id': 'current_station_state',
+            'platforms': initial_platforms,
+            'arrivingTrains': sorted(initial_schedule, key=_arrival_sort_key),
+            'waitingList': []
+        }
+        state_collection.insert_one(initial_state)
+        reset_state_cache()
+        log_action("System initialized: Station state created from master data.")
+    except Exception:
+        pass
+
+
 @app.on_event("startup")
 async def startup_event():
     global BLOCKAGE_MATRIX, INCOMING_LINES
     # Prefer MongoDB for blockage matrix + incoming lines when available.
-    mongo_matrix, mongo_lines = load_blockage_matrix_from_mongo()
+    # Blocking loaders run in worker threads so the loop is free while Mongo/disk respond.
+    mongo_matrix, mongo_lines = await asyncio.to_thread(load_blockage_matrix_from_mongo)
     if mongo_matrix and mongo_lines:
         BLOCKAGE_MATRIX, INCOMING_LINES = mongo_matrix, mongo_lines
     else:
-        BLOCKAGE_MATRIX, INCOMING_LINES = load_blockage_matrix()
+        BLOCKAGE_MATRIX, INCOMING_LINES = await asyncio.to_thread(load_blockage_matrix)
         # If only the line list exists in Mongo, use it for dropdowns.
         try:
-            mongo_only_lines = load_incoming_lines_from_mongo()
+            mongo_only_lines = await asyncio.to_thread(load_incoming_lines_from_mongo)
             if mongo_only_lines:
                 INCOMING_LINES = mongo_only_lines
         except Exception:
             pass
+    _rebuild_blockage_indexes()
+    _ensure_log_writer()
     # Ensure helpful indexes exist (idempotent)
-    # NOTE: Reports now allow multiple entries per train per day (reassign creates a new row),
-    # so we must NOT keep the old unique (date, trainNo) index.
-    try:
-        info = reports_collection.index_information() or {}
-        for idx_name, spec in info.items():
-            try:
-                if not spec.get('unique'):
-                    continue
-                keys = spec.get('key') or []
-                if keys == [('date', 1), ('trainNo', 1)]:
-                    reports_collection.drop_index(idx_name)
-            except Exception:
-                pass
-        reports_collection.create_index([('date', 1), ('trainNo', 1), ('event_time', 1)])
-    except Exception:
-        pass
-    try:
-        logs_collection.create_index('timestamp')
-    except Exception:
-        pass
+    await asyncio.to_thread(_ensure_indexes)
+    # The DB may have been edited or reseeded while we were down.
+    reset_state_cache()
+    # Initialize station state if absent
+    await asyncio.to_thread(_bootstrap_station_state)
+
+    # Repair if state exists but platforms list is empty
     try:
-        trains_collection.create_index('TRAIN NO', unique=True)
+        await _ensure_state_platforms_present(await get_state_async())
     except Exception:
         pass
-    # Initialize station state if absent
-    if state_collection.count_documents({}) == 0:
-        try:
-            platforms_master_raw = list(platforms_collection.find({}, {'_id': 0}))
-            if len(platforms_master_raw) == 1 and 'tracks' in platforms_master_raw[0]:
-                platforms_master = platforms_master_raw[0]['tracks']
-            else:
-                platforms_master = platforms_master_raw
-            trains_master = list(trains_collection.find({}, {'_id': 0}))
-            initial_platforms = []
-            for track_data in platforms_master:
-                is_platform = track_data.get('is_platform', False)
-                item_id = track_data['id'].replace('P', '').replace('T', '')
-                initial_platforms.append({
-                    'id': f"Platform {item_id}" if is_platform else f"Track {item_id}",
-                    'isOccupied': False,
-                    'trainDetails': None,
-                    'isUnderMaintenance': False,
-                    'actualArrival': None
-                })
-            initial_schedule = []
-            for row in trains_master:
-                initial_schedule.append({
-                    'trainNo': str(row['TRAIN NO']),
-                    'name': row['TRAIN NAME'],
-                    'scheduled_arrival': row.get('ARRIVAL AT KGP'),
-                    'scheduled_departure': row.get('DEPARTURE FROM KGP')
-                })
-            initial_state = {
-                '_id': 'current_station_state',
-                'platforms': initial_platforms,
-                'arrivingTrains': sorted(initial_schedule, key=lambda x: x.get('scheduled_arrival') or x.get('scheduled_departure') or '99:99'),
-                'waitingList': []
-            }
-            state_collection.insert_one(initial_state)
-            log_action("System initialized: Station state created from master data.")
-        except Exception:
-            pass
 
-    # Repair if state exists but platforms list is empty
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    # The log writer and report flush timer are daemon threads; push out anything
+    # still queued so the last actions before a restart are not lost.
     try:
-        _ensure_state_platforms_present()
+        await asyncio.to_thread(flush_report_updates)
     except Exception:
         pass
+    await asyncio.to_thread(drain_log_queue)
 
 
 # ---------- Routes ----------
@@ -1069,14 +1944,26 @@ async def health():
 
 @app.get("/api/stream")
 async def stream():
-    def event_generator():
-        yield ": connected\n\n"
-        while True:
-            try:
-                msg = sse_broadcaster.get(timeout=15)
-                yield msg
-            except queue.Empty:
-                yield "event: ping\ndata: {}\n\n"
+    async def event_generator():
+        q = sse_broadcaster.subscribe()
+        try:
+            yield _SSE_CONNECTED
+            while True:
+                try:
+                    msg = await asyncio.wait_for(q.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    yield _SSE_PING
+                    continue
+                # Flush a burst of events as a single chunk.
+                parts = [msg]
+                while len(parts) < SSE_MAX_COALESCE:
+                    try:
+                        parts.append(q.get_nowait())
+                    except asyncio.QueueEmpty:
+                        break
+                yield b''.join(parts)
+        finally:
+            sse_broadcaster.unsubscribe(q)
 
     headers = {
         "Cache-Control": "no-cache",
@@ -1089,47 +1976,56 @@ async def stream():
 
 @app.get("/api/station-data")
 async def get_station_data():
-    state = _ensure_state_platforms_present()
+    state = await _ensure_state_platforms_present(await get_state_async())
     if state and '_id' in state:
         state['_id'] = str(state['_id'])
-    # Sync arriving trains from master
+    # Sync arriving trains from master (only when the master rows or the state doc changed)
     try:
-        master = list(trains_collection.find({}, {'_id': 0}))
-        arr = state.get('arrivingTrains', []) or []
-        by_no = {str(t.get('trainNo')): t for t in arr}
-        changed = False
-        for row in master:
-            train_no = str(row.get('TRAIN NO'))
-            if not train_no:
-                continue
-            entry = {
-                'trainNo': train_no,
-                'name': row.get('TRAIN NAME'),
-                'scheduled_arrival': row.get('ARRIVAL AT KGP'),
-                'scheduled_departure': row.get('DEPARTURE FROM KGP'),
-            }
-            if train_no in by_no:
-                cur = by_no[train_no]
-                if cur.get('name') != entry['name'] or cur.get('scheduled_arrival') != entry['scheduled_arrival'] or cur.get('scheduled_departure') != entry['scheduled_departure']:
-                    cur.update(entry)
-                    changed = True
-            else:
-                arr.append(entry)
-                by_no[train_no] = entry
-                changed = True
-        if changed:
-            arr.sort(key=lambda x: x.get('scheduled_arrival') or x.get('scheduled_departure') or '99:99')
-            state['arrivingTrains'] = arr
-            state_collection.replace_one({"_id": "current_station_state"}, state, upsert=True)
+        master = await run_in_threadpool(_master_schedule_rows)
+        if master is not _master_synced['rows'] or state is not _master_synced['state']:
+            arr = state['arrivingTrains']
+            by_no = {str(t.get('trainNo')): t for t in arr}
+            changed_ids: set[int] = set()
+            inserted = resort = False
+            for train_no, fields in master:
+                cur = by_no.get(train_no)
+                if cur is not None:
+                    if (cur.get('name'), cur.get('scheduled_arrival'), cur.get('scheduled_departure')) != fields:
+                        old_key = _arrival_sort_key(cur)
+                        cur.update(trainNo=train_no, name=fields[0], scheduled_arrival=fields[1], scheduled_departure=fields[2])
+                        resort = resort or _arrival_sort_key(cur) != old_key
+                        changed_ids.add(id(cur))
+                else:
+                    entry = {
+                        'trainNo': train_no,
+                        'name': fields[0],
+                        'scheduled_arrival': fields[1],
+                        'scheduled_departure': fields[2],
+                    }
+                    # arrivingTrains is persisted sorted; insert in place instead of re-sorting.
+                    bisect.insort(arr, entry, key=_arrival_sort_key)
+                    by_no[train_no] = entry
+                    inserted = True
+            if changed_ids or inserted:
+                if resort:
+                    arr.sort(key=_arrival_sort_key)
+                if inserted or resort:
+                    # Entries shifted position; rewrite the list once.
+                    update = {"$set": {"arrivingTrains": arr}}
+                else:
+                    update = {"$set": {f"arrivingTrains.{i}": t for i, t in enumerate(arr) if id(t) in changed_ids}}
+                await update_state_async(state, update)
+            _master_synced.update(rows=master, state=state)
     except Exception:
-        pass
-    state = enforce_track_layout(state)
+        # The cached list may already hold rows Mongo never got; reload it on the next read.
+        reset_state_cache()
+    state = await enforce_track_layout(state)
     return JSONResponse(state)
 
 
 @app.get("/api/logs")
 async def get_logs():
-    log_entries = list(logs_collection.find().sort("timestamp", -1).limit(100))
+    log_entries = await run_in_threadpool(lambda: list(logs_collection.find().sort("timestamp", -1).limit(100)))
     logs_json = [{"timestamp": log['timestamp'].strftime('%Y-%m-%d %H:%M:%S'), "action": log['action']} for log in log_entries]
     return logs_json
 
@@ -1163,7 +2059,9 @@ async def platform_suggestions(body: SuggestRequest, background_tasks: Backgroun
     station_codes = {c for c in (origin_code, destination_code, terminal_code) if c}
     prefer_a_ids = {'P1A', 'P2A'} if (station_codes & DOWN_STATIONS) else {'P3A', 'P4A'}
 
-    is_freight = 'Goods' in train_data.get('TRAIN NAME', '') or 'Freight' in train_data.get('TRAIN NAME', '')
+    is_freight = train_data.get('_isFreight')
+    if is_freight is None:
+        is_freight = _annotate_train_doc(train_data)['_isFreight']
 
     incoming_train = ScoringTrain(
         train_id=train_data.get('TRAIN NO'),
@@ -1202,11 +2100,11 @@ async def platform_suggestions(body: SuggestRequest, background_tasks: Backgroun
 
     # HIJ Freight is a special incoming line that should not depend on blockage matrix.
     # If the matrix lacks a row for it, we still want to suggest available platforms.
-    incoming_norm = re.sub(r"\s+", " ", str(incoming_line or '').strip()).lower()
+    incoming_norm = _norm(incoming_line)
     if incoming_norm == 'hij freight':
         def _sort_pf(pid: str):
             s = str(pid or '')
-            m = re.match(r'^([PT])(\d+)([A-Za-z]*)$', s)
+            m = _SIMPLE_PLATFORM_ID_RE.fullmatch(s)
             if not m:
                 return (9, 9999, s)
             kind = 0 if m.group(1) == 'P' else 1
@@ -1217,8 +2115,10 @@ async def platform_suggestions(body: SuggestRequest, background_tasks: Backgroun
         ranked = [{'platformId': pid, 'score': 0.0} for pid in sorted(available_platforms, key=_sort_pf)]
     else:
         scoring_incoming_line = resolve_incoming_line_for_blockage_matrix(incoming_line)
-        ranked = calculate_platform_scores(incoming_train, available_platforms, scoring_incoming_line, BLOCKAGE_MATRIX)
+        ranked = cached_platform_scores(incoming_train, available_platforms, scoring_incoming_line)
 
+    # First entry wins for duplicate ids, matching the previous linear scan.
+    frontend_by_id = {p.get('id'): p for p in reversed(frontend_platforms)} if is_long else {}
     final = []
     for suggestion in ranked:
         pf_id = suggestion['platformId']
@@ -1227,7 +2127,7 @@ async def platform_suggestions(body: SuggestRequest, background_tasks: Backgroun
         if is_long and display_id.startswith('Platform'):
             partner_id = find_partner_platform_id(display_id)
             if partner_id:
-                partner_entry = next((p for p in frontend_platforms if p.get('id') == partner_id), None)
+                partner_entry = frontend_by_id.get(partner_id)
                 if partner_entry and not partner_entry.get('isOccupied') and not partner_entry.get('isUnderMaintenance'):
                     if partner_id not in combined_ids:
                         combined_ids.append(partner_id)
@@ -1280,55 +2180,65 @@ async def get_incoming_lines():
 
 
 @app.post("/api/add-train")
-async def add_train(body: dict, background_tasks: BackgroundTasks):
-    if trains_collection.find_one({"TRAIN NO": str(body.get('TRAIN NO'))}):
+async def add_train(body: dict):
+    if await run_in_threadpool(trains_collection.find_one, {"TRAIN NO": str(body.get('TRAIN NO'))}, {'_id': 1}):
         raise HTTPException(status_code=409, detail=f"Train number {body.get('TRAIN NO')} already exists.")
-    trains_collection.insert_one(body)
+    await run_in_threadpool(trains_collection.insert_one, body)
     cache_train_doc(body)
-    state = state_collection.find_one({"_id": "current_station_state"}) or {}
-    arr = state.setdefault('arrivingTrains', [])
-    arr.append({
+    _invalidate_master_cache()
+    state = await get_state_async()
+    arr = state['arrivingTrains']
+    entry = {
         'trainNo': str(body['TRAIN NO']),
         'name': body['TRAIN NAME'],
         'scheduled_arrival': body.get('ARRIVAL AT KGP'),
         'scheduled_departure': body.get('DEPARTURE FROM KGP')
-    })
-    arr.sort(key=lambda x: x.get('scheduled_arrival') or x.get('scheduled_departure') or '99:99')
-    state_collection.replace_one({"_id": "current_station_state"}, state, upsert=True)
-    background_tasks.add_task(log_action, f"TRAIN ADDED: New train {body['TRAIN NO']} added to the master schedule.")
+    }
+    # arrivingTrains is persisted sorted; insert in place instead of re-sorting.
+    pos = bisect.bisect_right(arr, _arrival_sort_key(entry), key=_arrival_sort_key)
+    arr.insert(pos, entry)
+    await update_state_async(state, {"$push": {"arrivingTrains": {"$each": [entry], "$position": pos}}})
+    log_action(f"TRAIN ADDED: New train {body['TRAIN NO']} added to the master schedule.")
     return {"message": f"Train {body['TRAIN NO']} added successfully."}
 
 
 @app.post("/api/delete-train")
-async def delete_train(body: dict, background_tasks: BackgroundTasks):
+async def delete_train(body: dict):
     train_no_to_delete = str(body.get('trainNo'))
-    result = trains_collection.delete_one({"TRAIN NO": train_no_to_delete})
+    result = await run_in_threadpool(trains_collection.delete_one, {"TRAIN NO": train_no_to_delete})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail=f"Train {train_no_to_delete} not found in master list.")
     remove_from_train_cache(train_no_to_delete)
-    state = state_collection.find_one({"_id": "current_station_state"}) or {}
-    state['arrivingTrains'] = [t for t in state.get('arrivingTrains', []) if str(t['trainNo']) != train_no_to_delete]
-    state['waitingList'] = [t for t in state.get('waitingList', []) if str(t['trainNo']) != train_no_to_delete]
-    state_collection.replace_one({"_id": "current_station_state"}, state, upsert=True)
-    background_tasks.add_task(log_action, f"TRAIN DELETED: Train {train_no_to_delete} removed from the master schedule.")
+    _invalidate_master_cache()
+    state = await get_state_async()
+    pull = {}
+    for key in ('arrivingTrains', 'waitingList'):
+        kept = [t for t in state[key] if str(t['trainNo']) != train_no_to_delete]
+        if len(kept) != len(state[key]):
+            state[key] = kept
+            pull[key] = {"trainNo": train_no_to_delete}
+    if pull:
+        await update_state_async(state, {"$pull": pull})
+    log_action(f"TRAIN DELETED: Train {train_no_to_delete} removed from the master schedule.")
     return {"message": f"Train {train_no_to_delete} deleted successfully."}
 
 
 @app.post("/api/add-to-waiting-list")
-async def add_to_waiting_list(body: dict, background_tasks: BackgroundTasks):
+async def add_to_waiting_list(body: dict):
     train_no = body.get('trainNo')
     if not train_no:
         raise HTTPException(status_code=400, detail="Train number is required.")
-    state = state_collection.find_one({"_id": "current_station_state"}) or {}
-    wl = state.setdefault('waitingList', [])
-    if any(str(t.get('trainNo')) == str(train_no) for t in wl):
+    state = await get_state_async()
+    wl = state['waitingList']
+    train_key = str(train_no)
+    if train_key in {str(t.get('trainNo')) for t in wl}:
         return {"message": f"Train {train_no} is already in the waiting list."}
-    train_to_wait = next((t for t in state.get('arrivingTrains', []) if str(t['trainNo']) == str(train_no)), None)
+    train_to_wait = next((t for t in state['arrivingTrains'] if str(t['trainNo']) == train_key), None)
     if not train_to_wait:
         raise HTTPException(status_code=404, detail=f"Train {train_no} not found in arriving trains.")
 
     # For richer logging/report updates, try to capture the last known assigned platform from the report.
-    latest_report = get_latest_report_entry_for_today(str(train_no))
+    latest_report = await run_in_threadpool(get_latest_report_entry_for_today, str(train_no))
     previous_platform = ''
     try:
         previous_platform = (latest_report or {}).get('actual_platform') or ''
@@ -1336,55 +2246,54 @@ async def add_to_waiting_list(body: dict, background_tasks: BackgroundTasks):
         previous_platform = ''
     # prepare waiting entry with enqueue timestamp and actualArrival if provided
     # Use local timezone time (not UTC) so logs match the operator clock.
-    # Keep ISO format (24-hour) and include offset like +05:30.
-    enqueued_at = datetime.now().astimezone().isoformat()
+    # Keep ISO format (24-hour) and include offset like +05:30; enqueued_ms drives ordering.
+    enqueued = datetime.now().astimezone()
+    enqueued_at = enqueued.isoformat()
     actual_arrival = body.get('actualArrival') or train_to_wait.get('scheduled_arrival') or None
     incoming_line = body.get('incomingLine') or ''
     waiting_entry = {
         'trainNo': str(train_to_wait['trainNo']),
         'name': train_to_wait.get('name'),
         'enqueued_at': enqueued_at,
+        'enqueued_ms': int(enqueued.timestamp() * 1000),
         'actualArrival': actual_arrival,
         'incoming_line': incoming_line,
     }
+    existing_order = [id(t) for t in wl]
     wl.append(waiting_entry)
     # FCFS: whoever entered the waiting list first stays on top
-    def _wl_key(item: dict):
-        enq = item.get('enqueued_at') or ''
-        try:
-            dt = datetime.fromisoformat(enq)
-            return (dt.timestamp(), str(item.get('trainNo') or ''))
-        except Exception:
-            return (enq, str(item.get('trainNo') or ''))
-
-    wl.sort(key=_wl_key)
+    wl.sort(key=_waiting_sort_key)
     state['waitingList'] = wl
-    state_collection.replace_one({"_id": "current_station_state"}, state, upsert=True)
+    if [id(t) for t in wl if t is not waiting_entry] == existing_order:
+        pos = next(i for i, t in enumerate(wl) if t is waiting_entry)
+        await update_state_async(state, {"$push": {"waitingList": {"$each": [waiting_entry], "$position": pos}}})
+    else:
+        await update_state_async(state, {"$set": {"waitingList": wl}})
 
     # Update the latest existing report row (do NOT create a new row) to mark this move.
-    background_tasks.add_task(persist_report_update_if_exists, str(train_no), {'Remarks': 'waiting list'})
+    persist_report_update_if_exists(str(train_no), {'Remarks': 'waiting list'})
 
     prev_pf_part = f" (previousPlatform: {previous_platform})" if previous_platform else ""
-    background_tasks.add_task(
-        log_action,
+    log_action(
         f"WAITING LIST: Train {train_no} moved to waiting list at {enqueued_at} (actualArrival: {actual_arrival}) (incoming: {incoming_line}).{prev_pf_part}"
     )
     return {"message": f"Train {train_no} added to the waiting list."}
 
 
 @app.post("/api/remove-from-waiting-list")
-async def remove_from_waiting_list(body: dict, background_tasks: BackgroundTasks):
+async def remove_from_waiting_list(body: dict):
     train_no = body.get('trainNo')
     if not train_no:
         raise HTTPException(status_code=400, detail="Train number is required.")
-    state = state_collection.find_one({"_id": "current_station_state"}) or {}
-    wl = state.get('waitingList', [])
+    state = await get_state_async()
+    wl = state['waitingList']
     train_to_remove = next((t for t in wl if t['trainNo'] == train_no), None)
     if not train_to_remove:
         raise HTTPException(status_code=404, detail=f"Train {train_no} not found in the waiting list.")
-    state['waitingList'] = [t for t in wl if t['trainNo'] != train_no]
-    state_collection.replace_one({"_id": "current_station_state"}, state, upsert=True)
-    background_tasks.add_task(log_action, f"WAITING LIST: Train {train_no} removed from waiting list.")
+    with _state_cache['lock']:
+        wl.remove(train_to_remove)
+    await update_state_async(state, {"$pull": {"waitingList": {"trainNo": train_no}}})
+    log_action(f"WAITING LIST: Train {train_no} removed from waiting list.")
     # (No auto-suggestion trigger on waiting list removal per updated requirement.)
     return {"message": f"Train {train_no} removed from the waiting list."}
 
@@ -1402,18 +2311,18 @@ async def assign_platform(body: dict, background_tasks: BackgroundTasks):
     if not platform_ids:
         raise HTTPException(status_code=400, detail="platformIds are required for assignment.")
 
-    state = state_collection.find_one({"_id": "current_station_state"}) or {}
+    state = await get_state_async()
 
-    assignment_time_hhmm = datetime.now().strftime('%H:%M')
+    assignment_time_hhmm = _now_hhmm()
 
     # Prefer waiting list
-    wl_match = next((t for t in state.get('waitingList', []) if t.get('trainNo') == train_no), None)
+    wl_match = next((t for t in state['waitingList'] if t.get('trainNo') == train_no), None)
     generated_freight = False
     if wl_match:
         train_to_assign = wl_match
         from_wait = True
     else:
-        train_to_assign = next((t for t in state.get('arrivingTrains', []) if t.get('trainNo') == train_no), None)
+        train_to_assign = next((t for t in state['arrivingTrains'] if t.get('trainNo') == train_no), None)
         from_wait = False
     if not train_to_assign:
         if not train_no or force_freight or requested_train_name:
@@ -1437,15 +2346,12 @@ async def assign_platform(body: dict, background_tasks: BackgroundTasks):
             'LENGTH': body.get('length') or 'medium'
         }
 
-    if provided_incoming_line and not train_to_assign.get('incoming_line'):
-        train_to_assign['incoming_line'] = provided_incoming_line
-
     # If assigning from waiting list, CSV should record a NEW actual arrival time for the new row.
     # Keep UI/state `actualArrival` populated for display, but ensure report uses the new value.
     actual_arrival_for_state = actual_arrival or assignment_time_hhmm
     actual_arrival_for_report = assignment_time_hhmm if from_wait else actual_arrival_for_state
 
-    latest_report = get_latest_report_entry_for_today(str(train_no))
+    latest_report = await run_in_threadpool(get_latest_report_entry_for_today, str(train_no))
     previous_platform = ''
     try:
         previous_platform = (latest_report or {}).get('actual_platform') or ''
@@ -1453,72 +2359,85 @@ async def assign_platform(body: dict, background_tasks: BackgroundTasks):
         previous_platform = ''
     stoppage_seconds = time_difference_seconds(train_data.get('ARRIVAL AT KGP'), train_data.get('DEPARTURE FROM KGP'))
 
+    platforms = state['platforms']
+    pidx = _platform_positions(state)
     is_long = str(train_data.get('LENGTH', '')).strip().lower() == 'long'
     if is_long and len(platform_ids) == 1:
         requested = platform_ids[0]
         partner = find_partner_platform_id(requested)
         if partner:
-            partner_obj = next((p for p in state.get('platforms', []) if p.get('id') == partner), None)
+            partner_obj = platforms[pidx[partner]] if partner in pidx else None
             if partner_obj and not partner_obj.get('isOccupied') and not partner_obj.get('isUnderMaintenance'):
                 platform_ids = [requested, partner]
             else:
                 raise HTTPException(status_code=400, detail=f"Partner platform {partner} is not available for long train assignment.")
 
+    # Mutate the (cached) state only once every validation above has passed.
+    if provided_incoming_line and not train_to_assign.get('incoming_line'):
+        train_to_assign['incoming_line'] = provided_incoming_line
+
     is_linked = len(platform_ids) > 1
     linked_map = {platform_ids[0]: platform_ids[1], platform_ids[1]: platform_ids[0]} if is_linked else {}
 
-    for platform_id in platform_ids:
-        for i, p in enumerate(state['platforms']):
-            if p['id'] == platform_id:
-                # Include incoming line if available (prefer waiting list's stored value, else provided from frontend)
-                incoming_line_val = train_to_assign.get('incoming_line') or provided_incoming_line
-                # Mark the first platform in platform_ids as the primary (the one the user requested).
-                is_primary = (platform_id == platform_ids[0])
-                train_details = {"trainNo": train_to_assign['trainNo'], "name": train_to_assign['name']}
-                if incoming_line_val:
-                    train_details['incomingLine'] = incoming_line_val
-                if is_linked:
-                    train_details['linkedPlatformId'] = linked_map[platform_id]
-                if is_primary:
-                    train_details['isPrimary'] = True
-                state['platforms'][i]['isOccupied'] = True
-                state['platforms'][i]['trainDetails'] = train_details
-                state['platforms'][i]['actualArrival'] = actual_arrival_for_state
-                if stoppage_seconds > 0:
-                    timer = threading.Timer(stoppage_seconds, lambda: sse_broadcaster.put(
-                        f"event: departure_alert\ndata: {json.dumps({'train_number': train_no, 'train_name': train_data.get('TRAIN NAME'), 'platform_id': platform_id})}\n\n"
-                    ))
-                    with timers_lock:
-                        active_timers[platform_id] = timer
-                    timer.start()
-                break
-
-    if from_wait:
-        state['waitingList'] = [t for t in state.get('waitingList', []) if t['trainNo'] != train_no]
-        background_tasks.add_task(log_action, f"WAITING LIST: Train {train_no} removed from waiting list (assigned to platform).")
-
-    # record actual platform arrival timestamp
     # Record platform berth time in HH:MM for consistency with other timestamps
     actual_platform_arrival = assignment_time_hhmm
+    departure_alerts: list[tuple[str, bytes]] = []
     for platform_id in platform_ids:
-        for p in state.get('platforms', []):
-            if p.get('id') == platform_id and p.get('isOccupied') and p.get('trainDetails') and p['trainDetails'].get('trainNo') == train_no:
-                p['trainDetails']['actualPlatformArrival'] = actual_platform_arrival
-                p['actualPlatformArrival'] = actual_platform_arrival
-                break
-    # persist state synchronously, log and persist report in background
-    state_collection.replace_one({"_id": "current_station_state"}, state, upsert=True)
+        i = pidx.get(platform_id)
+        if i is None:
+            continue
+        platform = platforms[i]
+        # Include incoming line if available (prefer waiting list's stored value, else provided from frontend)
+        incoming_line_val = train_to_assign.get('incoming_line') or provided_incoming_line
+        # Mark the first platform in platform_ids as the primary (the one the user requested).
+        is_primary = (platform_id == platform_ids[0])
+        train_details = {"trainNo": train_to_assign['trainNo'], "name": train_to_assign['name']}
+        if incoming_line_val:
+            train_details['incomingLine'] = incoming_line_val
+        if is_linked:
+            train_details['linkedPlatformId'] = linked_map[platform_id]
+        if is_primary:
+            train_details['isPrimary'] = True
+        # record actual platform arrival timestamp
+        if train_details['trainNo'] == train_no:
+            train_details['actualPlatformArrival'] = actual_platform_arrival
+            platform['actualPlatformArrival'] = actual_platform_arrival
+        platform['isOccupied'] = True
+        platform['trainDetails'] = train_details
+        platform['actualArrival'] = actual_arrival_for_state
+        if stoppage_seconds > 0:
+            departure_alerts.append((platform_id, _sse_frame(
+                'departure_alert', {'train_number': train_no, 'train_name': train_data.get('TRAIN NAME'), 'platform_id': platform_id}
+            )))
+
+    if from_wait:
+        with _state_cache['lock']:
+            state['waitingList'].remove(wl_match)
+
+    # persist state first, then queue the log entries and report writes
+    update = {"$set": _platform_updates(state, platform_ids, pidx)}
+    if train_to_assign.get('incoming_line') and not from_wait and not generated_freight:
+        arriving = state['arrivingTrains']
+        pos = next((i for i, t in enumerate(arriving) if t is train_to_assign), None)
+        if pos is not None:
+            update["$set"][f"arrivingTrains.{pos}.incoming_line"] = train_to_assign['incoming_line']
+    if from_wait:
+        update["$pull"] = {"waitingList": {"trainNo": train_no}}
+    await update_state_async(state, update)
+    # Only alert for assignments that were actually saved.
+    for platform_id, frame in departure_alerts:
+        schedule_departure_alert(platform_id, stoppage_seconds, frame)
+    if from_wait:
+        log_action(f"WAITING LIST: Train {train_no} removed from waiting list (assigned to platform).")
     train_name_for_report = train_to_assign.get('name') or (train_data or {}).get('TRAIN NAME', '')
 
     if from_wait:
         prev_pf_part = f" (previousPlatform: {previous_platform})" if previous_platform else ""
-        background_tasks.add_task(
-            log_action,
+        log_action(
             f"ASSIGNED FROM WAITING LIST: Train {train_no} assigned to {', '.join(platform_ids)} at {actual_platform_arrival} (newActualArrival: {actual_arrival_for_report}).{prev_pf_part}"
         )
     else:
-        background_tasks.add_task(
-            log_action,
+        log_action(
             f"ARRIVED & ASSIGNED: Train {train_no} arrived at {actual_arrival_for_state} and assigned to {', '.join(platform_ids)}. (platformArrival: {actual_platform_arrival})"
         )
     # ASSIGN/REASSIGN should create a NEW report entry (new CSV row).
@@ -1552,8 +2471,9 @@ async def assign_track(body: dict, background_tasks: BackgroundTasks):
     train_name = body.get('trainName') or 'Freight'
     train_no = body.get('trainNo') or get_next_freight_tag()
 
-    state = state_collection.find_one({"_id": "current_station_state"}) or {}
-    track_entry = next((p for p in state.get('platforms', []) if p.get('id') == track_id), None)
+    state = await get_state_async()
+    pidx = _platform_positions(state)
+    track_entry = state['platforms'][pidx[track_id]] if track_id in pidx else None
     if not track_entry:
         raise HTTPException(status_code=404, detail=f"{track_id} not found in station state.")
     if track_entry.get('isOccupied'):
@@ -1561,7 +2481,7 @@ async def assign_track(body: dict, background_tasks: BackgroundTasks):
     if track_entry.get('isUnderMaintenance'):
         raise HTTPException(status_code=409, detail=f"{track_id} is under maintenance.")
 
-    arrival_timestamp = actual_arrival or datetime.now().strftime('%H:%M')
+    arrival_timestamp = actual_arrival or _now_hhmm()
     train_details = {
         'trainNo': str(train_no),
         'name': train_name,
@@ -1571,17 +2491,14 @@ async def assign_track(body: dict, background_tasks: BackgroundTasks):
     train_details['isFreightTrack'] = True
     train_details['actualPlatformArrival'] = arrival_timestamp
 
-    for i, p in enumerate(state.get('platforms', [])):
-        if p.get('id') == track_id:
-            state['platforms'][i]['isOccupied'] = True
-            state['platforms'][i]['trainDetails'] = train_details
-            state['platforms'][i]['actualArrival'] = arrival_timestamp
-            state['platforms'][i]['actualPlatformArrival'] = arrival_timestamp
-            break
+    track_entry['isOccupied'] = True
+    track_entry['trainDetails'] = train_details
+    track_entry['actualArrival'] = arrival_timestamp
+    track_entry['actualPlatformArrival'] = arrival_timestamp
 
-    state_collection.replace_one({"_id": "current_station_state"}, state, upsert=True)
+    await update_state_async(state, {"$set": _platform_updates(state, [track_id], pidx)})
     friendly_name = TRACK_LABELS.get(track_id, track_id)
-    background_tasks.add_task(log_action, f"FREIGHT TRACK ASSIGN: Train {train_no} assigned to {friendly_name} ({track_id}) (incoming {incoming_line}).")
+    log_action(f"FREIGHT TRACK ASSIGN: Train {train_no} assigned to {friendly_name} ({track_id}) (incoming {incoming_line}).")
     # Track assignment should also create a NEW report entry (new CSV row)
     background_tasks.add_task(
         persist_assignment_report_entry,
@@ -1601,178 +2518,83 @@ async def assign_track(body: dict, background_tasks: BackgroundTasks):
 @app.post("/api/unassign-platform")
 async def unassign_platform(body: dict, background_tasks: BackgroundTasks):
     platform_id = body.get('platformId')
-    state = state_collection.find_one({"_id": "current_station_state"}) or {}
-
-    def _clear_platform(state, pid):
-        platform_to_clear = next((p for p in state['platforms'] if p['id'] == pid), None)
-        if not platform_to_clear or not platform_to_clear['isOccupied']:
-            return None, None
-        with timers_lock:
-            if pid in active_timers:
-                active_timers[pid].cancel()
-                del active_timers[pid]
-        train_details = platform_to_clear['trainDetails']
-        linked_platform_id = train_details.get('linkedPlatformId') if train_details else None
-        platform_to_clear['isOccupied'] = False
-        platform_to_clear['trainDetails'] = None
-        platform_to_clear['actualArrival'] = None
-        return train_details, linked_platform_id
-
-    train_details, linked_platform_id = _clear_platform(state, platform_id)
+    state = await get_state_async()
+    platforms_by_id = _index_platforms(state)
+
+    train_details, cleared_platforms = _clear_train_platforms(platforms_by_id, platform_id)
     if not train_details:
         raise HTTPException(status_code=404, detail="Platform not found or is not occupied.")
-    cleared_platforms = [platform_id]
-    if linked_platform_id:
-        _clear_platform(state, linked_platform_id)
-        cleared_platforms.append(linked_platform_id)
-    else:
-        # Fallback partner clear for long trains if link missing
-        train_data = get_train_record(str(train_details.get('trainNo')))
-        is_long = str(train_data.get('LENGTH', '')).strip().lower() == 'long'
-        if is_long:
-            partner_guess = find_partner_platform_id(platform_id)
-            if partner_guess:
-                partner_obj = next((p for p in state.get('platforms', []) if p.get('id') == partner_guess), None)
-                if partner_obj and partner_obj.get('isOccupied') and partner_obj.get('trainDetails') and partner_obj['trainDetails'].get('trainNo') == train_details.get('trainNo'):
-                    _clear_platform(state, partner_guess)
-                    cleared_platforms.append(partner_guess)
-
-    # Persist state synchronously for immediate reflection; log in background
-    state_collection.replace_one({"_id": "current_station_state"}, state, upsert=True)
-    background_tasks.add_task(log_action, f"UNASSIGNED: Train {train_details['trainNo']} unassigned from {', '.join(cleared_platforms)} and returned to arrival list.")
+
+    # Persist state first, then queue the log entry and report update
+    await update_state_async(state, {"$set": _platform_updates(state, cleared_platforms)})
+    for pid in cleared_platforms:
+        cancel_departure_alert(pid)
+    log_action(f"UNASSIGNED: Train {train_details['trainNo']} unassigned from {', '.join(cleared_platforms)} and returned to arrival list.")
     # Requirement: when unassigned, write "unassign" into Remarks on the current/latest row.
     try:
         # IMPORTANT: do not create a new baseline row here; only update the latest existing row.
-        background_tasks.add_task(persist_report_update_if_exists, train_details['trainNo'], {'Remarks': 'unassigned'})
+        persist_report_update_if_exists(train_details['trainNo'], {'Remarks': 'unassigned'})
     except Exception:
         pass
 
-    # If suggestions already exist on the latest report row, carry them forward so the next
-    # assignment row can include them even if the operator doesn't recompute suggestions.
-    try:
-        latest_report = get_latest_report_entry_for_today(str(train_details['trainNo'])) or {}
-        suggestions_field = latest_report.get('suggestions')
-        if not suggestions_field:
-            suggestions_field = latest_report.get('top3_suggestions')
-        incoming_line_for_cache = latest_report.get('incoming_line') or ''
-        if suggestions_field:
-            date_key = _today_str()
-            suggestions_cache_collection.update_one(
-                {"date": date_key, "trainNo": str(train_details['trainNo'])},
-                {
-                    "$set": {
-                        "date": date_key,
-                        "trainNo": str(train_details['trainNo']),
-                        "suggestions": suggestions_field,
-                        "incoming_line": incoming_line_for_cache,
-                        "updated_at": datetime.utcnow().isoformat(),
-                    }
-                },
-                upsert=True,
-            )
-    except Exception:
-        pass
+    # Carry existing suggestions forward for the next assignment row; off the request path.
+    background_tasks.add_task(carry_forward_report_suggestions, str(train_details['trainNo']))
     # (No auto-suggestion trigger on unassign per updated requirement.)
     return {"message": f"Train {train_details['trainNo']} unassigned from {', '.join(cleared_platforms)}."}
 
 
 @app.post("/api/depart-train")
-async def depart_train(body: dict, background_tasks: BackgroundTasks):
+async def depart_train(body: dict):
     platform_id = body.get('platformId')
     line = body.get('line') or body.get('outgoingLine') or body.get('outgoing_line')
-    state = state_collection.find_one({"_id": "current_station_state"}) or {}
-
-    def _clear_platform(state, pid):
-        platform_to_clear = next((p for p in state['platforms'] if p['id'] == pid), None)
-        if not platform_to_clear or not platform_to_clear['isOccupied']:
-            return None, None
-        with timers_lock:
-            if pid in active_timers:
-                active_timers[pid].cancel()
-                del active_timers[pid]
-        train_details = platform_to_clear['trainDetails']
-        linked_platform_id = train_details.get('linkedPlatformId') if train_details else None
-        platform_to_clear['isOccupied'] = False
-        platform_to_clear['trainDetails'] = None
-        platform_to_clear['actualArrival'] = None
-        return train_details, linked_platform_id
-
-    train_details, linked_platform_id = _clear_platform(state, platform_id)
+    state = await get_state_async()
+    platforms_by_id = _index_platforms(state)
+
+    train_details, cleared_platforms = _clear_train_platforms(platforms_by_id, platform_id)
     if not train_details:
         raise HTTPException(status_code=404, detail="Platform not found or is not occupied.")
-    cleared_platforms = [platform_id]
-    # If partner recorded via linkedPlatformId, clear it
-    if linked_platform_id:
-        _clear_platform(state, linked_platform_id)
-        cleared_platforms.append(linked_platform_id)
-    else:
-        # Fallback: for long trains ensure partner is cleared even if link missing
-        # Detect long train from master data
-        train_data = get_train_record(str(train_details.get('trainNo')))
-        is_long = str(train_data.get('LENGTH', '')).strip().lower() == 'long'
-        if is_long:
-            def find_partner(pid: str):
-                m = re.match(r"^(Platform)\s*(\d+)([A-Za-z]*)$", pid)
-                if not m:
-                    return None
-                base, num_str, suffix = m.group(1), m.group(2), m.group(3) or ''
-                try:
-                    num = int(num_str)
-                except ValueError:
-                    return None
-                partner_map = {1: 3, 2: 4, 3: 1, 4: 2}
-                if num not in partner_map:
-                    return None
-                partner_num = partner_map[num]
-                return f"{base} {partner_num}{suffix}"
-            partner_guess = find_partner(platform_id)
-            if partner_guess:
-                partner_obj = next((p for p in state.get('platforms', []) if p.get('id') == partner_guess), None)
-                if partner_obj and partner_obj.get('isOccupied') and partner_obj.get('trainDetails') and partner_obj['trainDetails'].get('trainNo') == train_details.get('trainNo'):
-                    _clear_platform(state, partner_guess)
-                    cleared_platforms.append(partner_guess)
-
-    departure_time = datetime.now().strftime('%H:%M')
+
+    departure_time = _now_hhmm()
+    await update_state_async(state, {"$set": _platform_updates(state, cleared_platforms)})
+    for pid in cleared_platforms:
+        cancel_departure_alert(pid)
 
     # IMPORTANT: do not create a new baseline row on depart; update the latest assignment row.
     update_fields = {'actual_departure': departure_time}
     if line:
         update_fields['outgoing_line'] = line
-    background_tasks.add_task(persist_report_update_if_exists, train_details['trainNo'], update_fields)
+    persist_report_update_if_exists(train_details['trainNo'], update_fields)
 
     # Single combined departure log (includes departure line if provided)
     if line:
-        background_tasks.add_task(
-            log_action,
+        log_action(
             f"Train {train_details['trainNo']} departed from {platform_id} at {departure_time} via {line}."
         )
     else:
-        background_tasks.add_task(
-            log_action,
+        log_action(
             f"Train {train_details['trainNo']} departed from {platform_id} at {departure_time}."
         )
-    state_collection.replace_one({"_id": "current_station_state"}, state, upsert=True)
     return {"message": f"Train {train_details['trainNo']} departed from {', '.join(cleared_platforms)}."}
 
 
 @app.post("/api/log-depart-line")
-async def log_depart_line(body: dict, background_tasks: BackgroundTasks):
+async def log_depart_line(body: dict):
     platform_id = body.get('platformId')
     line = body.get('line')
     if not platform_id or not line:
         raise HTTPException(status_code=400, detail="platformId and line required.")
-    state = state_collection.find_one({"_id": "current_station_state"}) or {}
+    state = await get_state_async()
     train_no = None
     try:
-        for p in state.get('platforms', []):
-            if p.get('id') == platform_id and p.get('isOccupied') and p.get('trainDetails'):
-                train_no = str(p['trainDetails']['trainNo'])
-                break
+        i = _platform_positions(state).get(platform_id)
+        p = state['platforms'][i] if i is not None else None
+        if p and p.get('isOccupied') and p.get('trainDetails'):
+            train_no = str(p['trainDetails']['trainNo'])
     except Exception:
         pass
     if train_no:
         # IMPORTANT: do not create a new baseline row here; update the latest existing row.
-        background_tasks.add_task(persist_report_update_if_exists, train_no, {'outgoing_line': line})
+        persist_report_update_if_exists(train_no, {'outgoing_line': line})
     # (No suggestion trigger here.)
     return {"message": "Departure line logged."}
 
@@ -1780,24 +2602,49 @@ async def log_depart_line(body: dict, background_tasks: BackgroundTasks):
 @app.post("/api/toggle-maintenance")
 async def toggle_maintenance(body: dict):
     platform_id = body.get('platformId')
-    state = state_collection.find_one({"_id": "current_station_state"}) or {}
+    state = await get_state_async()
 
     status = None
-    for i, p in enumerate(state.get('platforms', [])):
-        if p.get('id') == platform_id:
-            if state['platforms'][i]['isOccupied']:
-                raise HTTPException(status_code=400, detail="Cannot change maintenance on an occupied platform.")
-            state['platforms'][i]['isUnderMaintenance'] = not state['platforms'][i]['isUnderMaintenance']
-            status = "ON" if state['platforms'][i]['isUnderMaintenance'] else "OFF"
-            break
-
+    update = None
+    i = _platform_positions(state).get(platform_id)
+    if i is not None:
+        platform = state['platforms'][i]
+        if platform['isOccupied']:
+            raise HTTPException(status_code=400, detail="Cannot change maintenance on an occupied platform.")
+        platform['isUnderMaintenance'] = not platform['isUnderMaintenance']
+        status = "ON" if platform['isUnderMaintenance'] else "OFF"
+        update = {"$set": {f"platforms.{i}.isUnderMaintenance": platform['isUnderMaintenance']}}
+
+    if update:
+        await update_state_async(state, update)
     log_action(f"MAINTENANCE: Maintenance for {platform_id} set to {status}.")
-    state_collection.replace_one({"_id": "current_station_state"}, state, upsert=True)
     return {"message": f"Maintenance status toggled for {platform_id}."}
 
 
+def _accepts_gzip(accept_encoding: str) -> bool:
+    """True if an Accept-Encoding header allows gzip (q > 0, directly or via '*')."""
+    explicit = wildcard = None
+    for item in accept_encoding.split(','):
+        coding, *params = (part.strip() for part in item.split(';'))
+        q = 1.0
+        for param in params:
+            if param[:2].lower() == 'q=':
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        coding = coding.lower()
+        if coding in ('gzip', 'x-gzip'):
+            explicit = q if explicit is None else max(explicit, q)
+        elif coding == '*':
+            wildcard = q
+    q = explicit if explicit is not None else wildcard
+    return bool(q and q > 0)
+
+
 @app.get("/api/report/download")
 async def download_report(
+    request: Request,
     date: str | None = None,
     startDate: str | None = None,
     endDate: str | None = None,
@@ -1811,7 +2658,7 @@ async def download_report(
     """
 
     def _is_ymd(s: str) -> bool:
-        return bool(re.match(r"^\d{4}-\d{2}-\d{2}$", s or ''))
+        return bool(_YMD_RE.fullmatch(s or ''))
 
     use_range = bool(startDate or endDate)
     if use_range:
@@ -1832,62 +2679,83 @@ async def download_report(
         query = {"date": date_str}
         filename = f"{date_str}.csv"
 
+    # Stream from a cursor so memory stays flat for long date ranges; batches are
+    # pulled in the threadpool to keep blocking driver I/O off the event loop.
     try:
-        rows = list(
+        await run_in_threadpool(flush_report_updates)
+        cursor = (
             reports_collection
-            .find(query, {"_id": 0})
+            .find(query, REPORT_CSV_PROJECTION)
             .sort([("date", 1), ("trainNo", 1), ("event_time", 1)])
+            .batch_size(CSV_CURSOR_BATCH_SIZE)
         )
+        first_batch = await run_in_threadpool(_next_cursor_batch, cursor)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to read reports: {e}")
 
-    headers_list = [
-        'date', 'trainNo', 'trainName', 'scheduled_arrival', 'scheduled_departure',
-        'actual_arrival', 'actual_departure', 'actual_platform_arrival', 'suggestions', 'actual_platform',
-        'incoming_line', 'outgoing_line', 'Remarks'
-    ]
-
-    def generate():
-        yield ','.join(headers_list) + '\n'
-        for r in rows:
-            suggestions_field = r.get('suggestions') or r.get('top3_suggestions', [])
-            normalized_suggestions = ', '.join(normalize_platform_labels(coerce_label_list(suggestions_field)))
-            actual_platform_field = r.get('actual_platform', '')
-            normalized_actual_platform = ', '.join(normalize_platform_labels(coerce_label_list(actual_platform_field))) if actual_platform_field else ''
-            values = [
-                r.get('date', ''),
-                str(r.get('trainNo', '')),
-                (r.get('trainName', '') or '').replace(',', ' '),
-                r.get('scheduled_arrival', '') or '',
-                r.get('scheduled_departure', '') or '',
-                r.get('actual_arrival', '') or '',
-                r.get('actual_departure', '') or '',
-                r.get('actual_platform_arrival', '') or '',
-                normalized_suggestions.replace(',', ';'),
-                normalized_actual_platform or '',
-                r.get('incoming_line', '') or '',
-                r.get('outgoing_line', '') or '',
-                r.get('Remarks', '') or '',
-            ]
-            safe = []
-            for v in values:
-                s = str(v)
-                if any(ch in s for ch in [',', '"', '\n']):
-                    s = '"' + s.replace('"', '""') + '"'
-                safe.append(s)
-            yield ','.join(safe) + '\n'
-
     headers = {
-        'Content-Type': 'text/csv; charset=utf-8',
-        'Content-Disposition': f'attachment; filename="{filename}"'
+        'Content-Type': _CSV_CONTENT_TYPE,
+        'Content-Disposition': _CSV_DISPOSITION_TMPL % filename,
+        'Vary': 'Accept-Encoding',
     }
-    return StreamingResponse(generate(), headers=headers)
+    # Report CSVs are very repetitive; gzip them here rather than with
+    # GZipMiddleware, which would also buffer the SSE stream.
+    use_gzip = _accepts_gzip(request.headers.get('accept-encoding', ''))
+    if use_gzip:
+        headers['Content-Encoding'] = 'gzip'
+
+    # Small reports fit in the first batch: build the body in one go and skip the
+    # async streaming machinery.
+    if len(first_batch) < CSV_INLINE_MAX_ROWS:
+        cursor.close()
+        out, writer = _new_report_csv_writer()
+        writer.writerows(map(_report_csv_row, first_batch))
+        body = _CSV_HEADER_BYTES + out.getvalue()
+        if use_gzip:
+            body = gzip.compress(body, compresslevel=CSV_GZIP_LEVEL)
+        return Response(content=body, headers=headers)
+
+    # Async so Starlette iterates it on the event loop instead of hopping to a
+    # worker thread for every chunk (iterate_in_threadpool).
+    async def generate():
+        # Fetching and formatting each cursor batch both happen in the threadpool,
+        # so the event loop only hands finished ~64 KiB byte chunks to the client.
+        yield _CSV_HEADER_BYTES
+        out, writer = _new_report_csv_writer()
+        writerows = writer.writerows
+        try:
+            more = await run_in_threadpool(_write_report_rows, writerows, first_batch)
+            while more:
+                if out.tell() >= CSV_STREAM_CHUNK_SIZE:
+                    yield out.getvalue()
+                    out.seek(0)
+                    out.truncate(0)
+                more = await run_in_threadpool(_write_next_report_batch, cursor, writerows)
+        finally:
+            cursor.close()
+        if out.tell():
+            yield out.getvalue()
+
+    async def generate_gzip():
+        # wbits=31 emits a gzip header/trailer around the deflate stream.
+        compressor = zlib.compressobj(CSV_GZIP_LEVEL, zlib.DEFLATED, 31)
+        async for chunk in generate():
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+        yield compressor.flush()
+
+    return StreamingResponse(generate_gzip() if use_gzip else generate(), headers=headers)
+
+
+# The debug payload never changes, so its SSE frame is encoded once.
+_DEBUG_ALERT_FRAME = _sse_frame('departure_alert', {'train_number': 'TEST-001', 'train_name': 'Debug Train', 'platform_id': 'Platform 1'})
 
 
 @app.get("/api/debug/push-alert")
 async def debug_push_alert():
     try:
-        sse_broadcaster.put(f"event: departure_alert\ndata: {json.dumps({'train_number': 'TEST-001', 'train_name': 'Debug Train', 'platform_id': 'Platform 1'})}\n\n")
+        sse_broadcaster.put(_DEBUG_ALERT_FRAME)
         return {"message": "Debug departure_alert sent"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -60,10 +60,19 @@ def get_available_platforms(frontend_platforms):
                 free_platforms.add(simple_id)
     return free_platforms
 
-def calculate_platform_scores(incoming_train, available_platforms, incoming_line, blockage_matrix):
+def flatten_blockage_matrix(blockage_matrix):
+    """Flatten `{line: {column: routes}}` into `{(line, column): routes}`."""
+    return {
+        (line, column): routes
+        for line, per_column in (blockage_matrix or {}).items()
+        for column, routes in per_column.items()
+    }
+
+def calculate_platform_scores(incoming_train, available_platforms, incoming_line, blockage_matrix, blockage_flat=None):
 
     platform_scores = {}
-    line_data = blockage_matrix.get(incoming_line, {})
+    if blockage_flat is None:
+        blockage_flat = flatten_blockage_matrix({incoming_line: blockage_matrix.get(incoming_line, {})})
     
     for platform_id in available_platforms:
         if platform_id.startswith('T'):
@@ -73,7 +82,7 @@ def calculate_platform_scores(incoming_train, available_platforms, incoming_line
         if platform_id in {'P1', 'P3', 'P1A', 'P3A'}: matrix_column = 'P1-3'
         if platform_id in {'P2', 'P4', 'P2A', 'P4A'}: matrix_column = 'P2-4'
 
-        routes = line_data.get(matrix_column)
+        routes = blockage_flat.get((incoming_line, matrix_column))
 
         if not routes:
             continue
@@ -118,13 +127,12 @@ def calculate_platform_scores(incoming_train, available_platforms, incoming_line
         if platform_id in {'P1', 'P3'}: matrix_column = 'P1-3'
         if platform_id in {'P2', 'P4'}: matrix_column = 'P2-4'
         
-        if matrix_column in line_data:
-            routes = line_data.get(matrix_column, [])
-            if routes:
-                best_route = min(routes, key=lambda r: (1 * len(r.get('full', [])) + 0.5 * len(r.get('partial', []))) / 1.5)
-                full = ', '.join(best_route.get('full', []))
-                part = ', '.join(best_route.get('partial', []))
-                best_route_info = f": [{full or part or 'None'}]"
+        routes = blockage_flat.get((incoming_line, matrix_column))
+        if routes:
+            best_route = min(routes, key=lambda r: (1 * len(r.get('full', [])) + 0.5 * len(r.get('partial', []))) / 1.5)
+            full = ', '.join(best_route.get('full', []))
+            part = ', '.join(best_route.get('partial', []))
+            best_route_info = f": [{full or part or 'None'}]"
 
         historical_platform = None
         historical_match = False
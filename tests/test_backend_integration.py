@@ -1,5 +1,10 @@
 from __future__ import annotations
 
+import csv
+import io
+
+import pytest
+
 
 def test_platform_suggestions_scoring_and_cache(seeded_client, app_module, today_str):
     payload = {
@@ -109,3 +114,234 @@ def test_assign_platform_merges_cached_suggestions_into_report(seeded_client, ap
     # Cache should be cleared after successful assignment insert.
     cache_doc = app_module.suggestions_cache_collection.find_one({"date": today_str, "trainNo": "12345"})
     assert cache_doc is None
+
+
+def test_depart_long_train_clears_partner_platform(seeded_client, app_module):
+    r1 = seeded_client.post(
+        "/api/assign-platform",
+        json={"trainNo": "99901", "platformIds": ["Platform 1"], "actualArrival": "11:02"},
+    )
+    assert r1.status_code == 200
+
+    state = seeded_client.get("/api/station-data").json()
+    occupied = {p["id"] for p in state["platforms"] if p.get("isOccupied")}
+    assert {"Platform 1", "Platform 3"} <= occupied
+
+    r2 = seeded_client.post("/api/depart-train", json={"platformId": "Platform 1", "line": "HWH UP"})
+    assert r2.status_code == 200
+
+    state = seeded_client.get("/api/station-data").json()
+    occupied = {p["id"] for p in state["platforms"] if p.get("isOccupied")}
+    assert "Platform 1" not in occupied
+    assert "Platform 3" not in occupied
+
+
+def test_state_write_after_external_change_returns_conflict(seeded_client, app_module):
+    seeded_client.get("/api/station-data")
+    # Simulate another process writing the station state behind our cache.
+    app_module.state_collection.update_one({"_id": "current_station_state"}, {"$inc": {"_version": 1}})
+
+    r1 = seeded_client.post("/api/toggle-maintenance", json={"platformId": "Platform 5"})
+    assert r1.status_code == 409
+
+    # The stale cache was dropped, so a retry applies against the fresh document.
+    r2 = seeded_client.post("/api/toggle-maintenance", json={"platformId": "Platform 5"})
+    assert r2.status_code == 200
+    persisted = app_module.state_collection.find_one({"_id": "current_station_state"})
+    platform = next(p for p in persisted["platforms"] if p["id"] == "Platform 5")
+    assert platform["isUnderMaintenance"] is True
+
+
+def test_departure_alert_follows_persisted_assignment(seeded_client, app_module):
+    app_module.trains_collection.update_one({"TRAIN NO": "12345"}, {"$set": {"DEPARTURE FROM KGP": "10:05"}})
+    app_module.refresh_train_cache()
+    payload = {"trainNo": "12345", "platformIds": ["Platform 2"], "actualArrival": "10:04", "incomingLine": "MDN DN Joint"}
+    seeded_client.get("/api/station-data")
+    app_module.state_collection.update_one({"_id": "current_station_state"}, {"$inc": {"_version": 1}})
+
+    assert seeded_client.post("/api/assign-platform", json=payload).status_code == 409
+    assert "Platform 2" not in app_module.active_timers
+
+    assert seeded_client.post("/api/assign-platform", json=payload).status_code == 200
+    assert "Platform 2" in app_module.active_timers
+    assert seeded_client.post("/api/unassign-platform", json={"platformId": "Platform 2"}).status_code == 200
+    assert "Platform 2" not in app_module.active_timers
+
+
+def test_update_against_dropped_state_is_rejected(seeded_client, app_module):
+    seeded_client.get("/api/station-data")
+    state = app_module.get_state()
+    app_module.reset_state_cache()
+    app_module.get_state()
+
+    with pytest.raises(app_module.HTTPException) as exc:
+        app_module.update_state(state, {"$set": {"platforms.0.isUnderMaintenance": True}})
+    assert exc.value.status_code == 409
+    persisted = app_module.state_collection.find_one({"_id": "current_station_state"})
+    assert persisted["platforms"][0]["isUnderMaintenance"] is False
+
+
+def test_station_data_syncs_new_master_trains_in_order(seeded_client, app_module):
+    app_module.trains_collection.insert_one(
+        {
+            "TRAIN NO": "55501",
+            "TRAIN NAME": "Passenger 55501",
+            "ARRIVAL AT KGP": "10:30",
+            "DEPARTURE FROM KGP": "10:40",
+            "LENGTH": "short",
+        }
+    )
+
+    state = seeded_client.get("/api/station-data").json()
+    assert [t["trainNo"] for t in state["arrivingTrains"]] == ["12345", "55501", "99901"]
+
+    persisted = app_module.state_collection.find_one({"_id": "current_station_state"})
+    assert [t["trainNo"] for t in persisted["arrivingTrains"]] == ["12345", "55501", "99901"]
+
+
+def test_station_data_sync_retries_after_failed_write(seeded_client, app_module, monkeypatch):
+    seeded_client.get("/api/station-data")
+    app_module.trains_collection.insert_one(
+        {"TRAIN NO": "55501", "TRAIN NAME": "Passenger 55501", "ARRIVAL AT KGP": "10:30", "DEPARTURE FROM KGP": "10:40"}
+    )
+    app_module._invalidate_master_cache()
+
+    def _fail(*args, **kwargs):
+        raise RuntimeError("transient")
+
+    monkeypatch.setattr(app_module.state_collection, "update_one", _fail)
+    monkeypatch.setattr(app_module.state_collection, "bulk_write", _fail)
+    seeded_client.get("/api/station-data")
+    monkeypatch.undo()
+
+    # The failed write dropped the cache, so the next poll merges the row again and persists it.
+    state = seeded_client.get("/api/station-data").json()
+    assert [t["trainNo"] for t in state["arrivingTrains"]] == ["12345", "55501", "99901"]
+    persisted = app_module.state_collection.find_one({"_id": "current_station_state"})
+    assert [t["trainNo"] for t in persisted["arrivingTrains"]] == ["12345", "55501", "99901"]
+
+
+def test_report_download_csv_rows(seeded_client, today_str):
+    r0 = seeded_client.post(
+        "/api/platform-suggestions",
+        json={
+            "trainNo": "12345",
+            "incomingLine": "MDN DN Joint",
+            "platforms": [
+                {"id": "Platform 1", "isOccupied": False, "isUnderMaintenance": False},
+                {"id": "Platform 2", "isOccupied": False, "isUnderMaintenance": False},
+            ],
+        },
+    )
+    assert r0.status_code == 200
+
+    r1 = seeded_client.post(
+        "/api/assign-platform",
+        json={"trainNo": "12345", "platformIds": ["Platform 2"], "actualArrival": "10:04", "incomingLine": "MDN DN Joint"},
+    )
+    assert r1.status_code == 200
+
+    r2 = seeded_client.get("/api/report/download", params={"date": today_str})
+    assert r2.status_code == 200
+    assert r2.headers["content-type"].startswith("text/csv")
+
+    rows = list(csv.DictReader(io.StringIO(r2.text)))
+    assert len(rows) == 1
+    assert rows[0]["trainNo"] == "12345"
+    assert rows[0]["trainName"] == "Passenger 12345"
+    assert rows[0]["actual_arrival"] == "10:04"
+    assert rows[0]["actual_platform"] == "2"
+    # Multi-platform suggestions keep their commas; csv quoting protects the column.
+    assert rows[0]["suggestions"] == "1, 2"
+    assert '"1, 2"' in r2.text
+    assert rows[0]["incoming_line"] == "MDN DN Joint"
+
+
+def test_report_download_streams_across_cursor_batches(seeded_client, app_module, today_str):
+    total = app_module.CSV_CURSOR_BATCH_SIZE * 2 + 5
+    app_module.reports_collection.insert_many(
+        [
+            {"date": today_str, "trainNo": f"{i:05d}", "trainName": "Bulk", "event_time": f"{i:05d}"}
+            for i in range(total)
+        ]
+    )
+
+    r = seeded_client.get("/api/report/download", params={"date": today_str}, headers={"Accept-Encoding": "gzip"})
+    assert r.status_code == 200
+    assert r.headers["content-encoding"] == "gzip"
+
+    rows = list(csv.DictReader(io.StringIO(r.text)))
+    assert len(rows) == total
+    assert rows[0]["trainNo"] == "00000"
+    assert rows[-1]["trainNo"] == f"{total - 1:05d}"
+
+    # An explicit q=0 refuses gzip.
+    r_plain = seeded_client.get("/api/report/download", params={"date": today_str}, headers={"Accept-Encoding": "gzip;q=0"})
+    assert "content-encoding" not in r_plain.headers
+    assert len(list(csv.DictReader(io.StringIO(r_plain.text)))) == total
+
+
+def test_report_update_after_unassign_is_visible_in_download(seeded_client, today_str):
+    r1 = seeded_client.post(
+        "/api/assign-platform",
+        json={"trainNo": "12345", "platformIds": ["Platform 2"], "actualArrival": "10:04", "incomingLine": "MDN DN Joint"},
+    )
+    assert r1.status_code == 200
+
+    r2 = seeded_client.post("/api/unassign-platform", json={"platformId": "Platform 2"})
+    assert r2.status_code == 200
+
+    # Report updates are coalesced; the download must still reflect them.
+    r3 = seeded_client.get("/api/report/download", params={"date": today_str})
+    rows = list(csv.DictReader(io.StringIO(r3.text)))
+    assert rows[-1]["trainNo"] == "12345"
+    assert rows[-1]["Remarks"] == "unassigned"
+
+
+def test_failed_report_flush_keeps_queued_updates(seeded_client, app_module, today_str, monkeypatch):
+    app_module.reports_collection.insert_one({"date": today_str, "trainNo": "12345", "event_time": "1"})
+    app_module.queue_report_update_if_exists("12345", {"Remarks": "departed"}, today_str)
+
+    def _fail(*args, **kwargs):
+        raise RuntimeError("transient")
+
+    monkeypatch.setattr(app_module.reports_collection, "bulk_write", _fail)
+    app_module.flush_report_updates()
+    monkeypatch.undo()
+    assert "Remarks" not in app_module.reports_collection.find_one({"trainNo": "12345"})
+
+    app_module.flush_report_updates()
+    assert app_module.reports_collection.find_one({"trainNo": "12345"})["Remarks"] == "departed"
+
+
+def test_failed_report_flush_does_not_retarget_a_newer_row(seeded_client, app_module, today_str, monkeypatch):
+    app_module.reports_collection.insert_one({"date": today_str, "trainNo": "12345", "event_time": "1"})
+    app_module.queue_report_update_if_exists("12345", {"Remarks": "unassigned"}, today_str)
+
+    def _fail(*args, **kwargs):
+        raise RuntimeError("transient")
+
+    monkeypatch.setattr(app_module.reports_collection, "bulk_write", _fail)
+    app_module.append_daily_report_entry("12345", {"event_time": "2"}, today_str)
+    monkeypatch.undo()
+
+    assert app_module.flush_report_updates()
+    rows = {r["event_time"]: r for r in app_module.reports_collection.find({"trainNo": "12345"})}
+    assert rows["1"]["Remarks"] == "unassigned"
+    assert rows["2"]["Remarks"] == ""
+
+    # A batch that keeps failing is eventually dropped instead of retried forever.
+    app_module.queue_report_update_if_exists("12345", {"Remarks": "departed"}, today_str)
+    monkeypatch.setattr(app_module.reports_collection, "bulk_write", _fail)
+    for _ in range(app_module.REPORT_FLUSH_MAX_ATTEMPTS):
+        assert not app_module.flush_report_updates()
+    monkeypatch.undo()
+    assert not app_module._report_update_retries
+
+
+def test_generated_freight_with_malformed_arrival_is_assigned(seeded_client):
+    r = seeded_client.post(
+        "/api/assign-platform",
+        json={"trainNo": "", "platformIds": ["Platform 5"], "actualArrival": ["10:00"], "isFreight": True},
+    )
+    assert r.status_code == 200